@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
@@ -55,6 +55,13 @@ def create_app():
     app.config["JWT_COOKIE_CSRF_PROTECT"] = False
     jwt.init_app(app)
 
+    # -------------------------------------
+    # Billing spool flusher (replays jobs spooled while Redis was down)
+    # -------------------------------------
+    from backend.services.billing_spool import start_spool_flusher
+
+    start_spool_flusher()
+
     # -------------------------------------
     # Register Blueprints
     # -------------------------------------
@@ -117,6 +124,16 @@ def create_app():
             logger.exception("Health check failed")
             return jsonify({"success": False, "error": "Service unhealthy"}), 500
 
+    # -------------------------------------
+    # Prometheus Metrics (billing pipeline)
+    # -------------------------------------
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        from backend.services import billing_metrics  # noqa: F401 (registers)
+        from backend.utils.metrics import CONTENT_TYPE, REGISTRY
+
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
     # -------------------------------------
     # 404 Handler (Important)
     # -------------------------------------
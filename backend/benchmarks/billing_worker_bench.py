@@ -0,0 +1,431 @@
+"""
+Billing worker throughput benchmark.
+
+Drives the real worker loop (billing_worker.start_worker) against local
+stand-ins and reports invoices/sec, per-job latency and DB round trips:
+
+    python -m backend.benchmarks.billing_worker_bench --jobs 2000
+    python -m backend.benchmarks.billing_worker_bench --mode batch --batch-size 200
+    python -m backend.benchmarks.billing_worker_bench --mode concurrent --threads 8
+
+Database: a fresh SQLite file built from backend/models, or --database-url
+pointing at a scratch MySQL schema (its tables are dropped and recreated).
+Redis: in-process fakeredis (default), a spawned redis-server on a free
+port (--redis spawn) or the REDIS_* settings (--redis env; only billing_*
+keys are cleared).
+
+Job latency is reserve -> settle for each job, so a batched job reports
+the latency of its whole batch.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, time as dt_time, timedelta
+
+MODES = ("single", "batch", "concurrent")
+
+
+# -------------------------------------------------
+# Stand-ins
+#
+# backend.utils.db and backend.utils.redis_client connect at import, so
+# DATABASE_URL / REDIS_* must be in place before any backend import.
+# -------------------------------------------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_redis_server():
+    if not shutil.which("redis-server"):
+        raise RuntimeError("redis-server not found on PATH (use --redis fake)")
+
+    port = _free_port()
+    process = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        with contextlib.suppress(OSError):
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            os.environ["REDIS_HOST"] = "127.0.0.1"
+            os.environ["REDIS_PORT"] = str(port)
+            return process
+        time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError("redis-server did not start")
+
+
+def use_fakeredis():
+    # Swap the shared pool's connection class so every client built on it
+    # (billing queue, registered Lua scripts) talks to one in-process server.
+    import fakeredis
+    from backend.utils.redis_client import redis_pool
+
+    redis_pool.connection_class = fakeredis.FakeRedisConnection
+    redis_pool.connection_kwargs["server"] = fakeredis.FakeServer()
+
+
+# -------------------------------------------------
+# Instrumentation
+# -------------------------------------------------
+class Probe:
+    """
+    Counts DB round trips (statements + commits/rollbacks) on the shared
+    engine and times every job from reservation to settlement by wrapping
+    the worker module's reserve/settle hooks.
+    """
+
+    def __init__(self, engine, worker_module):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.round_trips = 0
+        self.latencies = []
+        self.succeeded = 0
+        self.dead = 0
+        self.retried = 0
+        self.settled = threading.Event()
+        self.expected = 0
+
+        from sqlalchemy import event
+
+        for name in ("before_cursor_execute", "commit", "rollback"):
+            event.listen(engine, name, self._count_round_trip)
+
+        reserve = worker_module.reserve_billing_jobs
+        settle = worker_module.settle_job
+
+        def timed_reserve(*args, **kwargs):
+            reserved = reserve(*args, **kwargs)
+            self._local.reserved_at = time.perf_counter()
+            return reserved
+
+        def timed_settle(worker_id, receipt, job_json, error):
+            settle(worker_id, receipt, job_json, error)
+            self._record(time.perf_counter() - self._local.reserved_at, error)
+
+        worker_module.reserve_billing_jobs = timed_reserve
+        worker_module.settle_job = timed_settle
+
+    def _count_round_trip(self, *args, **kwargs):
+        with self._lock:
+            self.round_trips += 1
+
+    def _record(self, latency, error):
+        with self._lock:
+            self.latencies.append(latency)
+            if error is None:
+                self.succeeded += 1
+            elif isinstance(error, ValueError):
+                self.dead += 1
+            else:
+                self.retried += 1
+
+            if self.succeeded + self.dead >= self.expected:
+                self.settled.set()
+
+    def reset(self, expected):
+        with self._lock:
+            self.round_trips = 0
+            self.latencies = []
+            self.succeeded = self.dead = self.retried = 0
+            self.expected = expected
+            self.settled.clear()
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value, value
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+# -------------------------------------------------
+# Fixtures
+# -------------------------------------------------
+def reset_state(engine, redis_client):
+    from backend.models.base import Base
+
+    # Register every mapped table before create_all
+    from backend.models import (  # noqa: F401
+        appointment,
+        availability_slot,
+        department,
+        doctor,
+        doctor_schedule,
+        invoice,
+        medical_record,
+        user,
+    )
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    keys = list(redis_client.scan_iter(match="billing_*", count=1000))
+    if keys:
+        redis_client.delete(*keys)
+
+
+def seed_appointments(engine, count):
+    """One doctor, one patient and `count` completed appointments."""
+    from sqlalchemy import insert
+    from backend.models.appointment import Appointment
+    from backend.models.availability_slot import AvailabilitySlot
+    from backend.models.department import Department
+    from backend.models.doctor import Doctor
+    from backend.models.user import User
+
+    first_day = date(2030, 1, 1)
+    slots, appointments = [], []
+
+    for i in range(1, count + 1):
+        day = first_day + timedelta(days=i // 1000)
+        start = dt_time((i % 1000) // 60, (i % 1000) % 60)
+        slots.append(
+            {
+                "id": i,
+                "doctor_id": 1,
+                "date": day,
+                "start_time": start,
+                "end_time": start,
+                "is_booked": True,
+            }
+        )
+        appointments.append(
+            {
+                "id": i,
+                "patient_id": 2,
+                "doctor_id": 1,
+                "slot_id": i,
+                "appointment_date": day,
+                "status": "completed",
+            }
+        )
+
+    with engine.begin() as connection:
+        connection.execute(insert(Department), [{"id": 1, "name": "Bench"}])
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "id": 1,
+                    "name": "Bench Doctor",
+                    "email": "doctor@bench.local",
+                    "password": "x",
+                    "role": "doctor",
+                },
+                {
+                    "id": 2,
+                    "name": "Bench Patient",
+                    "email": "patient@bench.local",
+                    "password": "x",
+                    "role": "patient",
+                },
+            ],
+        )
+        connection.execute(
+            insert(Doctor),
+            [{"id": 1, "user_id": 1, "department_id": 1, "consultation_fee": 700}],
+        )
+        connection.execute(insert(AvailabilitySlot), slots)
+        connection.execute(insert(Appointment), appointments)
+
+    return [a["id"] for a in appointments]
+
+
+# -------------------------------------------------
+# Runs
+# -------------------------------------------------
+def run_mode(mode, jobs, batch_size, threads, timeout, verbose, probe):
+    from backend.models.invoice import Invoice
+    from backend.services.billing_queue import enqueue_billing_jobs
+    from backend.utils.db import engine, get_db_session
+    from backend.utils.redis_client import redis_client
+    from backend.workers import billing_worker
+
+    if mode == "single":
+        batch_size, threads = 1, 1
+    elif mode == "batch":
+        threads = 1
+    else:
+        batch_size = 1
+
+    reset_state(engine, redis_client)
+    appointment_ids = seed_appointments(engine, jobs)
+
+    started = time.perf_counter()
+    queued = enqueue_billing_jobs(appointment_ids)
+    enqueue_elapsed = time.perf_counter() - started
+
+    if queued != jobs:
+        raise RuntimeError(f"Enqueued {queued} of {jobs} jobs")
+
+    probe.reset(jobs)
+    stop_event = threading.Event()
+    quiet = (
+        contextlib.nullcontext()
+        if verbose
+        else contextlib.redirect_stdout(io.StringIO())
+    )
+
+    with quiet:
+        workers = [
+            threading.Thread(
+                target=billing_worker.start_worker,
+                kwargs={
+                    "batch_size": batch_size,
+                    "worker_id": f"bench:{mode}:{t}",
+                    "stop_event": stop_event,
+                },
+                daemon=True,
+            )
+            for t in range(threads)
+        ]
+
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        finished = probe.settled.wait(timeout)
+        elapsed = time.perf_counter() - started
+
+        stop_event.set()
+        for worker in workers:
+            worker.join()
+
+    session = get_db_session()
+    try:
+        invoices = session.query(Invoice).count()
+    finally:
+        session.close()
+
+    p50, p95, p99 = percentiles(probe.latencies)
+
+    return {
+        "mode": mode,
+        "jobs": jobs,
+        "batch_size": batch_size,
+        "threads": threads,
+        "completed": finished,
+        "elapsed": elapsed,
+        "enqueue_rate": jobs / max(enqueue_elapsed, 1e-9),
+        "throughput": probe.succeeded / max(elapsed, 1e-9),
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+        "round_trips_per_job": probe.round_trips / jobs,
+        "invoices": invoices,
+        "retried": probe.retried,
+        "dead": probe.dead,
+    }
+
+
+def print_report(result):
+    status = (
+        "✅" if result["completed"] and result["invoices"] == result["jobs"] else "❌"
+    )
+    print(
+        f"{status} {result['mode']:<10} | jobs={result['jobs']} | "
+        f"batch={result['batch_size']} | threads={result['threads']} | "
+        f"{result['throughput']:.1f} invoices/s | "
+        f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+        f"p99={result['p99_ms']:.2f}ms | "
+        f"db_round_trips/job={result['round_trips_per_job']:.2f} | "
+        f"invoices={result['invoices']} | retried={result['retried']} | "
+        f"dead={result['dead']} | enqueue={result['enqueue_rate']:.0f} jobs/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Billing worker throughput benchmark")
+    parser.add_argument(
+        "--jobs", type=int, default=1000, help="Appointments to invoice"
+    )
+    parser.add_argument(
+        "--mode", choices=MODES + ("all",), default="all", help="Worker mode to run"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="Jobs per transaction (batch mode)"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Consumer threads (concurrent mode)"
+    )
+    parser.add_argument(
+        "--redis",
+        choices=("fake", "spawn", "env"),
+        default="fake",
+        help="fakeredis, a spawned redis-server, or the REDIS_* settings",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="Scratch database to use instead of a temporary SQLite file",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="Max seconds per mode"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Keep the worker's per-job output"
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="billing_bench_")
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    )
+    os.environ.setdefault("BILLING_SPOOL_PATH", os.path.join(workdir, "spool.db"))
+
+    redis_process = spawn_redis_server() if args.redis == "spawn" else None
+
+    try:
+        if args.redis == "fake":
+            use_fakeredis()
+
+        from backend.utils.db import engine
+        from backend.workers import billing_worker
+
+        probe = Probe(engine, billing_worker)
+        modes = MODES if args.mode == "all" else (args.mode,)
+
+        print(
+            f"📊 Billing worker benchmark | db={engine.url.get_backend_name()} | "
+            f"redis={args.redis} | jobs={args.jobs}"
+        )
+
+        for mode in modes:
+            print_report(
+                run_mode(
+                    mode,
+                    jobs=max(1, args.jobs),
+                    batch_size=max(1, args.batch_size),
+                    threads=max(1, args.threads),
+                    timeout=args.timeout,
+                    verbose=args.verbose,
+                    probe=probe,
+                )
+            )
+
+    finally:
+        if redis_process:
+            redis_process.terminate()
+            redis_process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
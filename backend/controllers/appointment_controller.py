@@ -3,13 +3,21 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime
 
 from backend.services.appointment_service import (
+    BookingConflictError,
     get_doctors_by_department,
     get_available_slots,
+    get_doctor_calendar_service,
+    get_next_available_slots_service,
     book_appointment_service,
+    book_appointments_service,
+    reschedule_appointment_service,
     cancel_appointment_service,
     get_patient_appointments_service,
     complete_appointment_service,
+    export_appointments_service,
 )
+from backend.utils.export import export_response
+from backend.utils.idempotency import idempotent
 
 appointment_bp = Blueprint("appointment", __name__, url_prefix="/api/appointments")
 
@@ -68,12 +76,75 @@ def fetch_available_slots():
         return jsonify({"error": str(e)}), 500
 
 
+# -------------------------------------------------
+# Doctor's Monthly Calendar (free / total slots per day)
+# GET /api/appointments/calendar?doctor_id=1&month=2026-02
+# -------------------------------------------------
+@appointment_bp.route("/calendar", methods=["GET"])
+def fetch_doctor_calendar():
+    try:
+        doctor_id = request.args.get("doctor_id", type=int)
+        month = request.args.get("month")
+
+        if doctor_id is None or not month:
+            return jsonify({"error": "doctor_id and month are required"}), 400
+
+        result = get_doctor_calendar_service(doctor_id, month)
+
+        return jsonify(result), 200
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        print("FETCH CALENDAR ERROR:", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+# -------------------------------------------------
+# Next Available Slots in a Department
+# GET /api/appointments/next-available?department_id=1&from=2026-02-20&limit=20
+#     &cursor=<next_cursor from the previous page>
+# -------------------------------------------------
+@appointment_bp.route("/next-available", methods=["GET"])
+def fetch_next_available():
+    try:
+        department_id = request.args.get("department_id", type=int)
+        from_str = request.args.get("from")
+        limit = request.args.get("limit", 20, type=int)
+        cursor = request.args.get("cursor")
+
+        if department_id is None:
+            return jsonify({"error": "department_id is required"}), 400
+
+        from_date = None
+        if from_str:
+            try:
+                from_date = datetime.strptime(from_str, "%Y-%m-%d").date()
+            except ValueError:
+                return jsonify(
+                    {"error": "Invalid date format (YYYY-MM-DD required)"}
+                ), 400
+
+        result = get_next_available_slots_service(
+            department_id, from_date=from_date, limit=limit, cursor=cursor
+        )
+
+        return jsonify(result), 200
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        print("NEXT AVAILABLE ERROR:", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 # -------------------------------------------------
 # Book Appointment
 # POST /api/appointments/book
 # -------------------------------------------------
 @appointment_bp.route("/book", methods=["POST"])
 @jwt_required()
+@idempotent
 def book_appointment():
     try:
         data = request.get_json()
@@ -105,6 +176,9 @@ def book_appointment():
             {"message": "Appointment booked successfully", "appointment": result}
         ), 201
 
+    except BookingConflictError as ce:
+        return jsonify({"error": str(ce)}), 409
+
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
 
@@ -115,6 +189,95 @@ def book_appointment():
         return jsonify({"error": str(e)}), 500
 
 
+# -------------------------------------------------
+# Book Several Slots At Once (all or nothing)
+# POST /api/appointments/book-multiple
+# {"doctor_id": 1, "slot_ids": [10, 11, 12]}
+# -------------------------------------------------
+@appointment_bp.route("/book-multiple", methods=["POST"])
+@jwt_required()
+@idempotent
+def book_multiple_appointments():
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        patient_id = int(get_jwt_identity())
+        claims = get_jwt()
+
+        if claims.get("role") != "patient":
+            return jsonify({"error": "Only patients can book appointments"}), 403
+
+        doctor_id = data.get("doctor_id")
+        slot_ids = data.get("slot_ids")
+
+        if doctor_id is None or not slot_ids:
+            return jsonify({"error": "doctor_id and slot_ids are required"}), 400
+
+        result = book_appointments_service(
+            patient_id=patient_id,
+            doctor_id=int(doctor_id),
+            slot_ids=slot_ids,
+        )
+
+        return jsonify(
+            {"message": "Appointments booked successfully", "booking": result}
+        ), 201
+
+    except BookingConflictError as ce:
+        return jsonify({"error": str(ce)}), 409
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# -------------------------------------------------
+# Reschedule Appointment (atomic move to another slot)
+# PUT /api/appointments/<appointment_id>/reschedule
+# {"slot_id": 42}
+# -------------------------------------------------
+@appointment_bp.route("/<int:appointment_id>/reschedule", methods=["PUT"])
+@jwt_required()
+@idempotent
+def reschedule_appointment(appointment_id):
+    try:
+        data = request.get_json()
+
+        patient_id = int(get_jwt_identity())
+        claims = get_jwt()
+
+        if claims.get("role") != "patient":
+            return jsonify({"error": "Only patients can reschedule appointments"}), 403
+
+        slot_id = (data or {}).get("slot_id")
+        if slot_id is None:
+            return jsonify({"error": "slot_id is required"}), 400
+
+        result = reschedule_appointment_service(
+            appointment_id=appointment_id,
+            patient_id=patient_id,
+            new_slot_id=int(slot_id),
+        )
+
+        return jsonify(
+            {"message": "Appointment rescheduled", "appointment": result}
+        ), 200
+
+    except BookingConflictError as ce:
+        return jsonify({"error": str(ce)}), 409
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
 # -------------------------------------------------
 # Cancel Appointment
 # DELETE /api/appointments/<appointment_id>
@@ -205,3 +368,36 @@ def get_my_appointments():
 
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
+
+
+# -------------------------------------------------
+# Export Appointments (Admin Only, streamed)
+# GET /api/appointments/export?format=ndjson|csv&status=&doctor_id=
+#     &patient_id=&date_from=&date_to=
+# -------------------------------------------------
+@appointment_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_appointments():
+    try:
+        claims = get_jwt()
+
+        if claims.get("role") != "admin":
+            return jsonify({"error": "Only admin can export appointments"}), 403
+
+        fmt = request.args.get("format", "ndjson")
+        chunks = export_appointments_service(
+            fmt,
+            status=request.args.get("status"),
+            doctor_id=request.args.get("doctor_id", type=int),
+            patient_id=request.args.get("patient_id", type=int),
+            date_from=request.args.get("date_from"),
+            date_to=request.args.get("date_to"),
+        )
+
+        return export_response(chunks, fmt, "appointments")
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
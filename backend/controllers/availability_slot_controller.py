@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
-from datetime import datetime
 
+from backend.services.availability_bitmap import (
+    find_earliest_window_service,
+    find_free_doctors_service,
+)
 from backend.services.availability_slot_service import (
+    SLOT_INSERT_CHUNK_SIZE,
     create_slot_service,
     create_bulk_slots_service,
     create_weekly_slots_service,
@@ -28,18 +32,14 @@ def create_slot():
 
         doctor_id = data.get("doctor_id")
         date = data.get("date")  # YYYY-MM-DD
-        start_time = data.get("start_time")  # HH:MM:SS
+        start_time = data.get("start_time")  # HH:MM or HH:MM:SS
         end_time = data.get("end_time")
 
         if not all([doctor_id, date, start_time, end_time]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Convert strings to proper types
-        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        start_time_obj = datetime.strptime(start_time, "%H:%M:%S").time()
-        end_time_obj = datetime.strptime(end_time, "%H:%M:%S").time()
-
-        result = create_slot_service(doctor_id, date_obj, start_time_obj, end_time_obj)
+        # The service parses the strings itself
+        result = create_slot_service(doctor_id, date, start_time, end_time)
 
         return jsonify({"message": "Slot created successfully", "slot": result}), 201
 
@@ -104,25 +104,35 @@ def create_weekly_slots():
 
         data = request.get_json()
 
-        doctor_id = data.get("doctor_id")
-        weekday = data.get("weekday")  # 0=Monday, 6=Sunday
+        doctor_ids = data.get("doctor_ids") or [data.get("doctor_id")]
+        weekdays = data.get("weekdays")  # [0=Monday ... 6=Sunday]
+        if weekdays is None:
+            weekdays = [data.get("weekday")]
         start_time = data.get("start_time")  # HH:MM
         end_time = data.get("end_time")  # HH:MM
         slot_duration = data.get("slot_duration_minutes")
         weeks = data.get("number_of_weeks")
 
         if not all(
-            [doctor_id, weekday is not None, start_time, end_time, slot_duration, weeks]
+            [
+                all(doctor_ids),
+                weekdays and all(w is not None for w in weekdays),
+                start_time,
+                end_time,
+                slot_duration,
+                weeks,
+            ]
         ):
             return jsonify({"error": "Missing required fields"}), 400
 
         result = create_weekly_slots_service(
-            doctor_id=doctor_id,
-            weekday=weekday,
+            doctor_ids=doctor_ids,
+            weekdays=weekdays,
             start_time=start_time,
             end_time=end_time,
-            slot_duration=slot_duration,
+            slot_duration_minutes=slot_duration,
             number_of_weeks=weeks,
+            chunk_size=data.get("chunk_size", SLOT_INSERT_CHUNK_SIZE),
         )
 
         return jsonify(
@@ -134,3 +144,148 @@ def create_weekly_slots():
 
     except Exception:
         return jsonify({"error": "Internal server error"}), 500
+
+
+# -----------------------------------------
+# Validate Slot Generation (Admin Only, dry run)
+# POST /api/slots/validate
+#
+# Same body as /bulk (a "date") or /weekly ("number_of_weeks"); returns
+# what would be created and what conflicts, without writing anything.
+# -----------------------------------------
+@slot_bp.route("/validate", methods=["POST"])
+@jwt_required()
+def validate_slots():
+    try:
+        claims = get_jwt()
+
+        if claims.get("role") != "admin":
+            return jsonify({"error": "Unauthorized"}), 403
+
+        data = request.get_json()
+
+        start_time = data.get("start_time")
+        end_time = data.get("end_time")
+        slot_duration = data.get("slot_duration_minutes")
+
+        if not all([start_time, end_time, slot_duration]):
+            return jsonify({"error": "Missing required fields"}), 400
+
+        if data.get("number_of_weeks"):
+            doctor_ids = data.get("doctor_ids") or [data.get("doctor_id")]
+            weekdays = data.get("weekdays")
+            if weekdays is None:
+                weekdays = [data.get("weekday")]
+
+            if not all(doctor_ids) or not weekdays:
+                return jsonify({"error": "Missing required fields"}), 400
+
+            result = create_weekly_slots_service(
+                doctor_ids=doctor_ids,
+                weekdays=weekdays,
+                start_time=start_time,
+                end_time=end_time,
+                slot_duration_minutes=slot_duration,
+                number_of_weeks=data.get("number_of_weeks"),
+                dry_run=True,
+            )
+
+        else:
+            doctor_id = data.get("doctor_id")
+            date = data.get("date")
+
+            if not all([doctor_id, date]):
+                return jsonify({"error": "Missing required fields"}), 400
+
+            result = create_bulk_slots_service(
+                doctor_id, date, start_time, end_time, slot_duration, dry_run=True
+            )
+
+        return jsonify({"message": "Validation complete", "slots": result}), 200
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
+def _doctor_ids_arg():
+    raw = request.args.get("doctor_ids")  # comma separated
+    if not raw:
+        return None
+
+    try:
+        return [int(d) for d in raw.split(",") if d.strip()]
+    except ValueError:
+        raise ValueError("doctor_ids must be comma separated integers")
+
+
+# -----------------------------------------
+# Who Is Free For A Window
+# GET /api/slots/search/free?date=2026-02-20&start_time=09:00&end_time=09:15
+#     &department_id=1  (or &doctor_ids=1,2,3)
+# -----------------------------------------
+@slot_bp.route("/search/free", methods=["GET"])
+@jwt_required()
+def search_free_doctors():
+    try:
+        date = request.args.get("date")
+        start_time = request.args.get("start_time")
+        end_time = request.args.get("end_time")
+
+        if not all([date, start_time, end_time]):
+            return jsonify({"error": "date, start_time and end_time are required"}), 400
+
+        result = find_free_doctors_service(
+            date,
+            start_time,
+            end_time,
+            department_id=request.args.get("department_id", type=int),
+            doctor_ids=_doctor_ids_arg(),
+        )
+
+        return jsonify(result), 200
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
+# -----------------------------------------
+# Earliest Free Window
+# GET /api/slots/search/earliest?date_from=2026-02-20&date_to=2026-02-27
+#     &duration_minutes=30&doctor_ids=1,2&mode=all  (or &department_id=1)
+#     &after_time=10:00  (first day only)
+# -----------------------------------------
+@slot_bp.route("/search/earliest", methods=["GET"])
+@jwt_required()
+def search_earliest_window():
+    try:
+        date_from = request.args.get("date_from")
+        duration = request.args.get("duration_minutes")
+
+        if not all([date_from, duration]):
+            return jsonify(
+                {"error": "date_from and duration_minutes are required"}
+            ), 400
+
+        window = find_earliest_window_service(
+            date_from,
+            duration,
+            date_to=request.args.get("date_to"),
+            after_time=request.args.get("after_time"),
+            department_id=request.args.get("department_id", type=int),
+            doctor_ids=_doctor_ids_arg(),
+            mode=request.args.get("mode", "all"),
+        )
+
+        return jsonify({"window": window}), 200
+
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
@@ -1,8 +1,15 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from backend.services.billing_service import pay_invoice
+from backend.services.invoice_service import (
+    INVOICE_PAGE_DEFAULT,
+    export_invoices_service,
+    list_invoices_service,
+)
 from backend.utils.db import get_db_session
+from backend.utils.export import export_response
 from backend.models.invoice import Invoice
+from backend.utils.idempotency import idempotent
 
 
 invoice_bp = Blueprint("invoice", __name__, url_prefix="/api/invoices")
@@ -11,36 +18,65 @@ invoice_bp = Blueprint("invoice", __name__, url_prefix="/api/invoices")
 @invoice_bp.route("", methods=["GET"])
 @jwt_required()
 def get_all_invoices():
-    session = get_db_session()
+    """
+    GET /api/invoices?limit=50&cursor=<next_cursor>&status=paid
+        &doctor_id=1&patient_id=2&date_from=2026-01-01&date_to=2026-01-31
+    """
     try:
         claims = get_jwt()
         if claims.get("role") != "admin":
             return jsonify({"error": "Only admin can view all invoices"}), 403
 
-        invoices = session.query(Invoice).order_by(Invoice.created_at.desc()).all()
+        result = list_invoices_service(
+            limit=request.args.get("limit", INVOICE_PAGE_DEFAULT, type=int),
+            cursor=request.args.get("cursor"),
+            status=request.args.get("status"),
+            doctor_id=request.args.get("doctor_id", type=int),
+            patient_id=request.args.get("patient_id", type=int),
+            date_from=request.args.get("date_from"),
+            date_to=request.args.get("date_to"),
+        )
 
-        return jsonify(
-            {
-                "count": len(invoices),
-                "invoices": [
-                    {
-                        "invoice_id": inv.id,
-                        "appointment_id": inv.appointment_id,
-                        "total_amount": inv.total_amount,
-                        "status": inv.status,
-                        "created_at": inv.created_at,
-                        "paid_at": inv.paid_at,
-                    }
-                    for inv in invoices
-                ],
-            }
-        ), 200
-    finally:
-        session.close()
+        return jsonify(result), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@invoice_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_invoices():
+    """
+    GET /api/invoices/export?format=ndjson|csv  (same filters as the listing)
+    """
+    try:
+        claims = get_jwt()
+        if claims.get("role") != "admin":
+            return jsonify({"error": "Only admin can export invoices"}), 403
+
+        fmt = request.args.get("format", "ndjson")
+        chunks = export_invoices_service(
+            fmt,
+            status=request.args.get("status"),
+            doctor_id=request.args.get("doctor_id", type=int),
+            patient_id=request.args.get("patient_id", type=int),
+            date_from=request.args.get("date_from"),
+            date_to=request.args.get("date_to"),
+        )
+
+        return export_response(chunks, fmt, "invoices")
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
 
 
 @invoice_bp.route("/pay/<int:invoice_id>", methods=["PUT"])
 @jwt_required()
+@idempotent
 def pay_invoice_endpoint(invoice_id):
     session = get_db_session()
     try:
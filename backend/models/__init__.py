@@ -2,4 +2,5 @@ from .user import User
 from .doctor import Doctor
 from .appointment import Appointment
 from .availability_slot import AvailabilitySlot
-from .department import Department
\ No newline at end of file
+from .department import Department
+from .slot_materialization import SlotMaterialization
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, String, ForeignKey, DateTime
+from sqlalchemy import Column, Computed, Integer, Date, String, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.models.base import Base
@@ -8,16 +8,32 @@ from sqlalchemy import UniqueConstraint
 
 class Appointment(Base):
     __tablename__ = "appointments"
-    __table_args__ = (UniqueConstraint("slot_id", name="uq_slot_booking"),)
+    # One live booking per slot: cancelled rows drop out of active_slot_id
+    # (NULL), so they stay on record and the slot can be booked again.
+    __table_args__ = (UniqueConstraint("active_slot_id", name="uq_slot_booking"),)
     id = Column(Integer, primary_key=True, index=True)
 
     patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=False)
-    slot_id = Column(Integer, ForeignKey("availability_slots.id"), nullable=False)
+    # RESTRICT, not CASCADE: MySQL forbids cascading actions on the base
+    # column of a stored generated column (active_slot_id)
+    slot_id = Column(
+        Integer,
+        ForeignKey("availability_slots.id", name="fk_slot", ondelete="RESTRICT"),
+        nullable=False,
+        index=True,
+    )
     appointment_date = Column(Date, nullable=False)
     status = Column(Enum("booked", "cancelled", "completed"), default="booked")
     created_at = Column(DateTime, default=datetime.utcnow)
+    active_slot_id = Column(
+        Integer,
+        Computed(
+            "CASE WHEN status = 'cancelled' THEN NULL ELSE slot_id END",
+            persisted=True,
+        ),
+    )
 
     doctor = relationship("Doctor", back_populates="appointments")
     patient = relationship("User")
-    slot = relationship("AvailabilitySlot", back_populates="appointment")
+    slot = relationship("AvailabilitySlot", back_populates="appointments")
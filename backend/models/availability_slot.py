@@ -5,6 +5,7 @@ from sqlalchemy import (
     Time,
     Boolean,
     ForeignKey,
+    Index,
     UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
@@ -15,6 +16,8 @@ class AvailabilitySlot(Base):
     __tablename__ = "availability_slots"
     __table_args__ = (
         UniqueConstraint("doctor_id", "date", "start_time", name="unique_doctor_slot"),
+        # Open slots in (date, start_time) order, for next-available search
+        Index("ix_slots_open_by_time", "is_booked", "date", "start_time"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -31,9 +34,9 @@ class AvailabilitySlot(Base):
     # Relationships
     # ----------------------------
     doctor = relationship("Doctor", back_populates="slots")
-    appointment = relationship(
+    # Every booking the slot has had; at most one is not cancelled
+    appointments = relationship(
         "Appointment",
         back_populates="slot",
-        uselist=False,
         cascade="all, delete-orphan",
     )
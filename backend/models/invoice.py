@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float
+from sqlalchemy import Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from backend.models.base import Base
 from datetime import datetime
@@ -6,6 +7,14 @@ from datetime import datetime
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        UniqueConstraint("appointment_id", name="uq_invoice_appointment"),
+        # Admin listing: newest first, optionally narrowed by one filter
+        Index("ix_invoices_created", "created_at", "id"),
+        Index("ix_invoices_status_created", "status", "created_at"),
+        Index("ix_invoices_doctor_created", "doctor_id", "created_at"),
+        Index("ix_invoices_patient_created", "patient_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
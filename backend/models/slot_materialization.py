@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Date, DateTime, String, ForeignKey
+from datetime import datetime
+from backend.models.base import Base
+
+
+class SlotMaterialization(Base):
+    """
+    Per-doctor high-water mark for the slot materializer: slots exist up
+    to `materialized_through` for the schedule whose hash is stored.
+    """
+
+    __tablename__ = "slot_materializations"
+
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), primary_key=True)
+    materialized_through = Column(Date, nullable=False)
+    schedule_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,7 +1,798 @@
 from backend.utils.db import get_db_session
+from backend.utils.export import check_export_format, stream_query
 from backend.models.appointment import Appointment
+from backend.models.availability_slot import AvailabilitySlot
+from backend.models.doctor import Doctor
+from backend.models.user import User
+from backend.services.availability_bitmap import mark_slot_booked, mark_slot_free
+from backend.services.billing_queue import enqueue_billing_job
+from backend.services.doctor_service import get_doctors_by_department_service
+from backend.services.slot_cache import (
+    get_cached_available_slots,
+    get_cached_calendar,
+    get_cached_next_available,
+    invalidate_available_slots,
+)
+from backend.services.slot_hold import (
+    acquire_slot_hold,
+    clear_slot_hold,
+    confirm_slot_hold,
+    release_slot_hold,
+)
+from sqlalchemy import and_, case, false, func, insert, or_, select, true, update
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload
-from datetime import datetime, timezone
+from datetime import datetime, time, timedelta, timezone
+import redis
+
+
+class BookingConflictError(ValueError):
+    """The slot was taken (or never bookable) - controllers answer 409."""
+
+
+# -----------------------------------------
+# Doctors / Slots lookups for the booking flow
+# -----------------------------------------
+def get_doctors_by_department(department_id):
+    if not isinstance(department_id, int) or department_id <= 0:
+        raise ValueError("Invalid department_id")
+
+    return get_doctors_by_department_service(department_id)
+
+
+def get_available_slots(doctor_id, date):
+    if not isinstance(doctor_id, int) or doctor_id <= 0:
+        raise ValueError("Invalid doctor_id")
+
+    return get_cached_available_slots(
+        doctor_id, date, lambda: _load_available_slots(doctor_id, date)
+    )
+
+
+def _load_available_slots(doctor_id, date):
+    session = get_db_session()
+
+    try:
+        slots = (
+            session.query(AvailabilitySlot)
+            .filter(
+                AvailabilitySlot.doctor_id == doctor_id,
+                AvailabilitySlot.date == date,
+                AvailabilitySlot.is_booked == false(),
+            )
+            .order_by(AvailabilitySlot.start_time)
+            .all()
+        )
+
+        return [
+            {
+                "slot_id": slot.id,
+                "start_time": str(slot.start_time),
+                "end_time": str(slot.end_time),
+            }
+            for slot in slots
+        ]
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Monthly calendar: free / total slots per day for one doctor
+#
+# One GROUP BY date over the doctor's slots in the month (served by
+# unique_doctor_slot), cached per (doctor, month) and dropped by every
+# slot write through invalidate_available_slots.
+# -----------------------------------------
+def get_doctor_calendar_service(doctor_id, month):
+    if not isinstance(doctor_id, int) or doctor_id <= 0:
+        raise ValueError("Invalid doctor_id")
+
+    try:
+        first_day = datetime.strptime(month, "%Y-%m").date()
+    except (TypeError, ValueError):
+        raise ValueError("Invalid month format (YYYY-MM required)")
+
+    month = first_day.strftime("%Y-%m")
+
+    return get_cached_calendar(
+        doctor_id, month, lambda: _load_doctor_calendar(doctor_id, first_day)
+    )
+
+
+def _load_doctor_calendar(doctor_id, first_day):
+    next_month = (first_day + timedelta(days=32)).replace(day=1)
+    session = get_db_session()
+
+    try:
+        counts = {
+            row.date: row
+            for row in session.query(
+                AvailabilitySlot.date,
+                func.count(AvailabilitySlot.id).label("total"),
+                func.sum(
+                    case((AvailabilitySlot.is_booked == false(), 1), else_=0)
+                ).label("free"),
+            )
+            .filter(
+                AvailabilitySlot.doctor_id == doctor_id,
+                AvailabilitySlot.date >= first_day,
+                AvailabilitySlot.date < next_month,
+            )
+            .group_by(AvailabilitySlot.date)
+        }
+
+        days = []
+        current_date = first_day
+        while current_date < next_month:
+            row = counts.get(current_date)
+            days.append(
+                {
+                    "date": str(current_date),
+                    "free": int(row.free or 0) if row else 0,
+                    "total": int(row.total) if row else 0,
+                }
+            )
+            current_date += timedelta(days=1)
+
+        return {
+            "doctor_id": doctor_id,
+            "month": first_day.strftime("%Y-%m"),
+            "days": days,
+        }
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Next available slots across a department
+#
+# One query: open slots joined to their doctor (and the doctor's name),
+# filtered by department and walked in (date, start_time, id) order on
+# ix_slots_open_by_time. Pages are keyset cursors ("date,start_time,id"
+# of the last row), so page N costs the same as page 1.
+# -----------------------------------------
+NEXT_AVAILABLE_MAX_LIMIT = 100
+
+
+def get_next_available_slots_service(
+    department_id, from_date=None, limit=20, cursor=None
+):
+    if not isinstance(department_id, int) or department_id <= 0:
+        raise ValueError("Invalid department_id")
+
+    limit = int(limit)
+    if limit <= 0 or limit > NEXT_AVAILABLE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {NEXT_AVAILABLE_MAX_LIMIT}")
+
+    from_date = from_date or datetime.today().date()
+
+    after = None
+    if cursor:
+        try:
+            cursor_date, cursor_time, cursor_id = cursor.split(",")
+            after = (
+                datetime.strptime(cursor_date, "%Y-%m-%d").date(),
+                time.fromisoformat(cursor_time),
+                int(cursor_id),
+            )
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    return get_cached_next_available(
+        department_id,
+        from_date,
+        cursor,
+        limit,
+        lambda: _load_next_available_slots(department_id, from_date, limit, after),
+    )
+
+
+def _load_next_available_slots(department_id, from_date, limit, after):
+    session = get_db_session()
+
+    try:
+        query = (
+            session.query(
+                AvailabilitySlot.id,
+                AvailabilitySlot.doctor_id,
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.end_time,
+                User.name.label("doctor_name"),
+                Doctor.specialization,
+            )
+            .join(Doctor, Doctor.id == AvailabilitySlot.doctor_id)
+            .outerjoin(User, User.id == Doctor.user_id)
+            .filter(
+                Doctor.department_id == department_id,
+                AvailabilitySlot.is_booked == false(),
+                AvailabilitySlot.date >= from_date,
+            )
+        )
+
+        if after:
+            after_date, after_time, after_id = after
+            query = query.filter(
+                AvailabilitySlot.date >= after_date,
+                or_(
+                    AvailabilitySlot.date > after_date,
+                    AvailabilitySlot.start_time > after_time,
+                    and_(
+                        AvailabilitySlot.start_time == after_time,
+                        AvailabilitySlot.id > after_id,
+                    ),
+                ),
+            )
+
+        rows = (
+            query.order_by(
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.id,
+            )
+            .limit(limit + 1)
+            .all()
+        )
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = f"{last.date},{last.start_time},{last.id}"
+
+        return {
+            "department_id": department_id,
+            "from": str(from_date),
+            "slots": [
+                {
+                    "slot_id": row.id,
+                    "doctor_id": row.doctor_id,
+                    "doctor_name": row.doctor_name,
+                    "specialization": row.specialization,
+                    "date": str(row.date),
+                    "start_time": str(row.start_time),
+                    "end_time": str(row.end_time),
+                }
+                for row in page
+            ],
+            "next_cursor": next_cursor,
+        }
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Book Appointment (compare-and-set)
+#
+#   1. UPDATE availability_slots SET is_booked=1
+#      WHERE id=? AND doctor_id=? AND is_booked=0
+#   2. SELECT the claimed slot's date (primary-key lookup)
+#   3. INSERT INTO appointments
+#
+# Step 1 is the only contended statement: exactly one transaction sees
+# rowcount=1, every other contender gets rowcount=0 and is answered after
+# that single round trip. No SELECT ... FOR UPDATE, and uq_slot_booking
+# stays a safety net rather than the arbiter. It only covers bookings that
+# are not cancelled, so earlier cancellations of the slot stay on record.
+#
+# A Redis slot hold (slot_hold.py) runs first, so under a click storm
+# only one request per slot reaches MySQL; the rest get 409 from Redis.
+# -----------------------------------------
+def book_appointment_service(patient_id, doctor_id, slot_id):
+    for name, value in (
+        ("patient_id", patient_id),
+        ("doctor_id", doctor_id),
+        ("slot_id", slot_id),
+    ):
+        if not isinstance(value, int) or value <= 0:
+            raise ValueError(f"Invalid {name}")
+
+    try:
+        hold = acquire_slot_hold(slot_id)
+    except redis.exceptions.RedisError as e:
+        # Redis down: the conditional UPDATE alone still guarantees one winner
+        print(f"⚠️ Slot hold unavailable, booking on DB only | error={str(e)}")
+        hold = None
+    else:
+        if hold is None:
+            raise BookingConflictError("Slot is not available")
+
+    try:
+        result = _claim_slot_and_book(patient_id, doctor_id, slot_id)
+    except Exception:
+        if hold:
+            release_slot_hold(slot_id, hold)
+        raise
+
+    if hold:
+        confirm_slot_hold(slot_id, hold)
+
+    invalidate_available_slots(doctor_id, [result["date"]])
+    mark_slot_booked(
+        doctor_id,
+        result["date"],
+        time.fromisoformat(result["start_time"]),
+        time.fromisoformat(result["end_time"]),
+    )
+
+    return result
+
+
+def _claim_slot_and_book(patient_id, doctor_id, slot_id):
+    session = get_db_session()
+
+    try:
+        claimed = session.execute(
+            update(AvailabilitySlot)
+            .where(
+                AvailabilitySlot.id == slot_id,
+                AvailabilitySlot.doctor_id == doctor_id,
+                AvailabilitySlot.is_booked == false(),
+            )
+            .values(is_booked=True)
+        ).rowcount
+
+        if claimed != 1:
+            session.rollback()
+            raise BookingConflictError("Slot is not available")
+
+        slot = session.execute(
+            select(
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.end_time,
+            ).where(AvailabilitySlot.id == slot_id)
+        ).one()
+
+        result = session.execute(
+            insert(Appointment).values(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                slot_id=slot_id,
+                appointment_date=slot.date,
+                status="booked",
+                created_at=datetime.utcnow(),
+            )
+        )
+
+        session.commit()
+
+        return {
+            "appointment_id": result.inserted_primary_key[0],
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "slot_id": slot_id,
+            "date": str(slot.date),
+            "start_time": str(slot.start_time),
+            "end_time": str(slot.end_time),
+            "status": "booked",
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Cancel Appointment (Patient)
+# -----------------------------------------
+def cancel_appointment_service(appointment_id, patient_id):
+    session = get_db_session()
+
+    try:
+        appointment = (
+            session.query(Appointment)
+            .filter(Appointment.id == appointment_id)
+            .with_for_update()
+            .first()
+        )
+
+        if not appointment or appointment.patient_id != patient_id:
+            raise ValueError("Appointment not found")
+
+        if appointment.status == "cancelled":
+            raise ValueError("Appointment already cancelled")
+
+        if appointment.status == "completed":
+            raise ValueError("Cannot cancel a completed appointment")
+
+        appointment.status = "cancelled"
+
+        # Free the slot with the same conditional write booking uses
+        session.execute(
+            update(AvailabilitySlot)
+            .where(
+                AvailabilitySlot.id == appointment.slot_id,
+                AvailabilitySlot.is_booked == true(),
+            )
+            .values(is_booked=False)
+        )
+
+        slot = appointment.slot
+        freed = (slot.date, slot.start_time, slot.end_time)
+
+        session.commit()
+
+        clear_slot_hold(appointment.slot_id)
+        invalidate_available_slots(
+            appointment.doctor_id, [appointment.appointment_date]
+        )
+        mark_slot_free(appointment.doctor_id, *freed)
+
+        return {
+            "message": "Appointment cancelled",
+            "appointment_id": appointment.id,
+            "slot_id": appointment.slot_id,
+            "status": appointment.status,
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Multi-slot booking and reschedule
+#
+# Both claim every target slot in one transaction, in ascending slot id
+# order (Redis holds first, then one conditional UPDATE ... WHERE id IN,
+# which InnoDB locks in primary-key order), so two requests over
+# overlapping slots can never deadlock and never half-succeed. Reschedule
+# locks the appointment row first, as cancel does, then claims the new
+# slot and frees the old one in id order, and moves the appointment row
+# itself, so its id and invoice stay attached.
+# -----------------------------------------
+MAX_SLOTS_PER_BOOKING = 20
+
+
+def _acquire_slot_holds(slot_ids):
+    """
+    Hold every slot (ascending id) or none. Returns {slot_id: token}, or
+    an empty dict when Redis is down and the DB claim has to decide alone.
+    """
+    holds = {}
+
+    try:
+        for slot_id in sorted(slot_ids):
+            token = acquire_slot_hold(slot_id)
+            if token is None:
+                for held_id, held_token in holds.items():
+                    release_slot_hold(held_id, held_token)
+                raise BookingConflictError(f"Slot {slot_id} is not available")
+            holds[slot_id] = token
+
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Slot holds unavailable, booking on DB only | error={str(e)}")
+        for held_id, held_token in holds.items():
+            release_slot_hold(held_id, held_token)
+        return {}
+
+    return holds
+
+
+def _claim_slots(session, doctor_id, slot_ids):
+    """One conditional UPDATE for all slots; all of them or a conflict."""
+    claimed = session.execute(
+        update(AvailabilitySlot)
+        .where(
+            AvailabilitySlot.id.in_(sorted(slot_ids)),
+            AvailabilitySlot.doctor_id == doctor_id,
+            AvailabilitySlot.is_booked == false(),
+        )
+        .values(is_booked=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if claimed != len(slot_ids):
+        session.rollback()
+        raise BookingConflictError("One or more slots are not available")
+
+
+def book_appointments_service(patient_id, doctor_id, slot_ids):
+    for name, value in (("patient_id", patient_id), ("doctor_id", doctor_id)):
+        if not isinstance(value, int) or value <= 0:
+            raise ValueError(f"Invalid {name}")
+
+    if not isinstance(slot_ids, list) or not slot_ids:
+        raise ValueError("slot_ids must be a non-empty list")
+
+    if not all(isinstance(slot_id, int) and slot_id > 0 for slot_id in slot_ids):
+        raise ValueError("Invalid slot_ids")
+
+    slot_ids = sorted(set(slot_ids))
+    if len(slot_ids) > MAX_SLOTS_PER_BOOKING:
+        raise ValueError(f"At most {MAX_SLOTS_PER_BOOKING} slots per booking")
+
+    holds = _acquire_slot_holds(slot_ids)
+
+    try:
+        result = _book_slots(patient_id, doctor_id, slot_ids)
+    except Exception:
+        for slot_id, token in holds.items():
+            release_slot_hold(slot_id, token)
+        raise
+
+    for slot_id, token in holds.items():
+        confirm_slot_hold(slot_id, token)
+
+    invalidate_available_slots(
+        doctor_id, sorted({item["date"] for item in result["appointments"]})
+    )
+    for item in result["appointments"]:
+        mark_slot_booked(
+            doctor_id,
+            item["date"],
+            time.fromisoformat(item["start_time"]),
+            time.fromisoformat(item["end_time"]),
+        )
+
+    return result
+
+
+def _book_slots(patient_id, doctor_id, slot_ids):
+    session = get_db_session()
+
+    try:
+        _claim_slots(session, doctor_id, slot_ids)
+
+        slots = session.execute(
+            select(
+                AvailabilitySlot.id,
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.end_time,
+            )
+            .where(AvailabilitySlot.id.in_(slot_ids))
+            .order_by(AvailabilitySlot.id)
+        ).all()
+
+        created_at = datetime.utcnow()
+        session.execute(
+            insert(Appointment),
+            [
+                {
+                    "patient_id": patient_id,
+                    "doctor_id": doctor_id,
+                    "slot_id": slot.id,
+                    "appointment_date": slot.date,
+                    "status": "booked",
+                    "created_at": created_at,
+                }
+                for slot in slots
+            ],
+        )
+
+        appointment_ids = dict(
+            session.execute(
+                # Live bookings only: cancelled rows on these slots stay on record
+                select(Appointment.slot_id, Appointment.id).where(
+                    Appointment.active_slot_id.in_(slot_ids)
+                )
+            ).all()
+        )
+
+        session.commit()
+
+        return {
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "status": "booked",
+            "appointments": [
+                {
+                    "appointment_id": appointment_ids[slot.id],
+                    "slot_id": slot.id,
+                    "date": str(slot.date),
+                    "start_time": str(slot.start_time),
+                    "end_time": str(slot.end_time),
+                }
+                for slot in slots
+            ],
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
+def reschedule_appointment_service(appointment_id, patient_id, new_slot_id):
+    for name, value in (
+        ("appointment_id", appointment_id),
+        ("patient_id", patient_id),
+        ("slot_id", new_slot_id),
+    ):
+        if not isinstance(value, int) or value <= 0:
+            raise ValueError(f"Invalid {name}")
+
+    holds = _acquire_slot_holds([new_slot_id])
+
+    try:
+        result, old_slot = _move_appointment(appointment_id, patient_id, new_slot_id)
+    except Exception:
+        for slot_id, token in holds.items():
+            release_slot_hold(slot_id, token)
+        raise
+
+    for slot_id, token in holds.items():
+        confirm_slot_hold(slot_id, token)
+    clear_slot_hold(old_slot.id)
+
+    invalidate_available_slots(result["doctor_id"], [old_slot.date, result["date"]])
+    mark_slot_free(
+        result["doctor_id"], old_slot.date, old_slot.start_time, old_slot.end_time
+    )
+    mark_slot_booked(
+        result["doctor_id"],
+        result["date"],
+        time.fromisoformat(result["start_time"]),
+        time.fromisoformat(result["end_time"]),
+    )
+
+    return result
+
+
+def _move_appointment(appointment_id, patient_id, new_slot_id):
+    session = get_db_session()
+
+    try:
+        appointment = (
+            session.query(Appointment)
+            .filter(Appointment.id == appointment_id)
+            .with_for_update()
+            .first()
+        )
+
+        if not appointment or appointment.patient_id != patient_id:
+            raise ValueError("Appointment not found")
+
+        if appointment.status != "booked":
+            raise ValueError(f"Cannot reschedule a {appointment.status} appointment")
+
+        old_slot_id = appointment.slot_id
+        if old_slot_id == new_slot_id:
+            raise ValueError("Appointment is already in this slot")
+
+        # Same doctor: the invoice (if any) was priced for this doctor
+        doctor_id = appointment.doctor_id
+
+        for slot_id in sorted((old_slot_id, new_slot_id)):
+            if slot_id == new_slot_id:
+                _claim_slots(session, doctor_id, [new_slot_id])
+            else:
+                session.execute(
+                    update(AvailabilitySlot)
+                    .where(AvailabilitySlot.id == old_slot_id)
+                    .values(is_booked=False)
+                    .execution_options(synchronize_session=False)
+                )
+
+        slots = {
+            slot.id: slot
+            for slot in session.execute(
+                select(
+                    AvailabilitySlot.id,
+                    AvailabilitySlot.date,
+                    AvailabilitySlot.start_time,
+                    AvailabilitySlot.end_time,
+                ).where(AvailabilitySlot.id.in_([old_slot_id, new_slot_id]))
+            )
+        }
+        new_slot = slots[new_slot_id]
+
+        appointment.slot_id = new_slot_id
+        appointment.appointment_date = new_slot.date
+
+        session.commit()
+
+        return {
+            "appointment_id": appointment_id,
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "slot_id": new_slot_id,
+            "previous_slot_id": old_slot_id,
+            "date": str(new_slot.date),
+            "start_time": str(new_slot.start_time),
+            "end_time": str(new_slot.end_time),
+            "status": "booked",
+        }, slots[old_slot_id]
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Appointment export (streamed NDJSON / CSV, oldest first)
+# -----------------------------------------
+APPOINTMENT_EXPORT_COLUMNS = (
+    Appointment.id,
+    Appointment.patient_id,
+    Appointment.doctor_id,
+    Appointment.slot_id,
+    Appointment.appointment_date,
+    Appointment.status,
+    Appointment.created_at,
+)
+
+
+def export_appointments_service(
+    fmt, status=None, doctor_id=None, patient_id=None, date_from=None, date_to=None
+):
+    """Validate now, return a generator of text chunks to stream."""
+    check_export_format(fmt)
+
+    filters = []
+    if status:
+        filters.append(Appointment.status == status)
+    if doctor_id is not None:
+        filters.append(Appointment.doctor_id == int(doctor_id))
+    if patient_id is not None:
+        filters.append(Appointment.patient_id == int(patient_id))
+
+    try:
+        if date_from:
+            first_day = datetime.strptime(date_from, "%Y-%m-%d").date()
+            filters.append(Appointment.appointment_date >= first_day)
+        if date_to:
+            last_day = datetime.strptime(date_to, "%Y-%m-%d").date()
+            filters.append(Appointment.appointment_date <= last_day)
+    except ValueError:
+        raise ValueError("Invalid date (YYYY-MM-DD required)")
+
+    return stream_query(
+        select(*APPOINTMENT_EXPORT_COLUMNS).where(*filters).order_by(Appointment.id),
+        [column.key for column in APPOINTMENT_EXPORT_COLUMNS],
+        fmt,
+    )
+
+
+# -----------------------------------------
+# Patient Appointments
+# -----------------------------------------
+def get_patient_appointments_service(patient_id, status=None):
+    session = get_db_session()
+
+    try:
+        query = (
+            session.query(Appointment)
+            .options(joinedload(Appointment.slot))
+            .filter(Appointment.patient_id == patient_id)
+        )
+
+        if status:
+            query = query.filter(Appointment.status == status)
+
+        appointments = query.order_by(Appointment.appointment_date.desc()).all()
+
+        return [
+            {
+                "appointment_id": a.id,
+                "doctor_id": a.doctor_id,
+                "slot_id": a.slot_id,
+                "status": a.status,
+                "date": str(a.appointment_date),
+                "start_time": str(a.slot.start_time) if a.slot else None,
+                "end_time": str(a.slot.end_time) if a.slot else None,
+            }
+            for a in appointments
+        ]
+
+    finally:
+        session.close()
 
 
 def get_doctor_appointments_service(doctor_id, status=None):
@@ -66,3 +857,49 @@ def get_doctor_appointments_service(doctor_id, status=None):
 
     finally:
         session.close()
+
+
+# -----------------------------------------
+# Complete Appointment (Admin / Doctor)
+# -----------------------------------------
+def complete_appointment_service(appointment_id):
+    session = get_db_session()
+
+    try:
+        # Compare-and-set: only the call that moves booked -> completed
+        # enqueues billing, so repeat completions never create a job.
+        completed = (
+            session.query(Appointment)
+            .filter(Appointment.id == appointment_id, Appointment.status == "booked")
+            .update({"status": "completed"}, synchronize_session=False)
+        )
+        session.commit()
+
+        if not completed:
+            status = (
+                session.query(Appointment.status)
+                .filter(Appointment.id == appointment_id)
+                .scalar()
+            )
+
+            if status is None:
+                raise ValueError("Appointment not found")
+
+            if status == "cancelled":
+                raise ValueError("Cannot complete a cancelled appointment")
+
+        else:
+            enqueue_billing_job(appointment_id)
+
+        return {
+            "message": "Appointment completed",
+            "appointment_id": appointment_id,
+            "status": "completed",
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
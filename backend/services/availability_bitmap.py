@@ -0,0 +1,396 @@
+import os
+from datetime import datetime, time, timedelta
+import redis
+from sqlalchemy import false
+from sqlalchemy.exc import SQLAlchemyError
+from backend.models.availability_slot import AvailabilitySlot
+from backend.models.doctor import Doctor
+from backend.utils.db import get_db_session
+from backend.utils.redis_client import redis_client
+
+# -------------------------------------------------
+# Per-(doctor, date) availability bitmaps for cross-doctor search
+#
+#   avail_bitmap:{doctor_id}:{date}      288 bits, one per 5-minute granule
+#   avail_bitmap:gen:{doctor_id}:{date}  generation, bumped by every writer
+#
+# A bit is set when an unbooked slot covers the whole granule. Bitmaps are
+# read and written as six u48 BITFIELD words (the shared client decodes
+# responses, so raw bytes are not an option); word 0 holds granules 0-47.
+# In Python a day is one int, granule g at bit (287 - g), so "free for the
+# whole window" is one AND with a mask and "earliest run of k free
+# granules" is k-1 shift-ANDs.
+#
+# Bookings and cancellations flip the slot's bits in place (if the bitmap
+# exists); slot generation drops the day. Missing days are rebuilt from
+# MySQL in one query and stored only if their generation did not move
+# meanwhile, like slot_cache.py. Redis errors fall back to MySQL.
+# -------------------------------------------------
+AVAILABILITY_BITMAP_PREFIX = "avail_bitmap:"
+AVAILABILITY_BITMAP_TTL = int(os.getenv("AVAILABILITY_BITMAP_TTL", 86400))  # seconds
+GENERATION_TTL = 86400  # seconds; only has to outlive one rebuild
+
+GRANULE_MINUTES = 5
+GRANULES = 24 * 60 // GRANULE_MINUTES  # 288
+WORD_BITS = 48
+WORDS = GRANULES // WORD_BITS  # 6
+WORD_MASK = (1 << WORD_BITS) - 1
+
+MAX_SEARCH_DAYS = 31
+
+_GET_WORDS = [arg for i in range(WORDS) for arg in ("GET", f"u{WORD_BITS}", f"#{i}")]
+
+# ARGV: first granule, last granule (exclusive), bit value
+_APPLY_SCRIPT = redis_client.register_script(
+    """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for g = tonumber(ARGV[1]), tonumber(ARGV[2]) - 1 do
+        redis.call('SETBIT', KEYS[1], g, ARGV[3])
+    end
+end
+return 1
+"""
+)
+
+# ARGV: generation seen before the DB read, ttl, then one value per word
+_FILL_SCRIPT = redis_client.register_script(
+    f"""
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 0, {WORDS - 1} do
+    redis.call('BITFIELD', KEYS[1], 'SET', 'u{WORD_BITS}', '#' .. i, ARGV[i + 3])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+)
+
+
+def _bitmap_key(doctor_id, date):
+    return f"{AVAILABILITY_BITMAP_PREFIX}{doctor_id}:{date}"
+
+
+def _generation_key(doctor_id, date):
+    return f"{AVAILABILITY_BITMAP_PREFIX}gen:{doctor_id}:{date}"
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute + (1 if value.second else 0)
+
+
+def _granule_range(start_time, end_time, outward=False):
+    """
+    Granules [first, last) of a time range. Inward for slots (only whole
+    granules count as free), outward for search windows (every granule
+    the window touches must be free).
+    """
+    start, end = _minutes(start_time), _minutes(end_time)
+
+    if outward:
+        return start // GRANULE_MINUTES, -(-end // GRANULE_MINUTES)
+
+    return -(-start // GRANULE_MINUTES), end // GRANULE_MINUTES
+
+
+def _mask(first, last):
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << (GRANULES - last)
+
+
+def _granule_time(granule):
+    minutes = granule * GRANULE_MINUTES
+    if minutes >= 24 * 60:
+        return time(23, 59, 59)
+    return time(minutes // 60, minutes % 60)
+
+
+def _words(bits):
+    return [(bits >> (WORD_BITS * (WORDS - 1 - i))) & WORD_MASK for i in range(WORDS)]
+
+
+def _from_words(words):
+    bits = 0
+    for word in words:
+        bits = (bits << WORD_BITS) | int(word)
+    return bits
+
+
+# -----------------------------------------
+# Writers
+# -----------------------------------------
+def _apply(doctor_id, date, start_time, end_time, bit):
+    first, last = _granule_range(start_time, end_time)
+    if last <= first:
+        return
+
+    try:
+        _APPLY_SCRIPT(
+            keys=[_bitmap_key(doctor_id, date), _generation_key(doctor_id, date)],
+            args=[first, last, bit, GENERATION_TTL],
+        )
+    except redis.exceptions.RedisError as e:
+        # Stale for at most AVAILABILITY_BITMAP_TTL; booking still checks MySQL
+        print(f"⚠️ Availability bitmap update failed | error={str(e)}")
+
+
+def mark_slot_booked(doctor_id, date, start_time, end_time):
+    _apply(doctor_id, date, start_time, end_time, 0)
+
+
+def mark_slot_free(doctor_id, date, start_time, end_time):
+    _apply(doctor_id, date, start_time, end_time, 1)
+
+
+def drop_availability_bitmaps(doctor_id, dates):
+    """Forget whole days after slot generation; rebuilt on the next search."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for date in dates:
+            generation_key = _generation_key(doctor_id, date)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, GENERATION_TTL)
+            pipe.delete(_bitmap_key(doctor_id, date))
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Availability bitmap drop failed | error={str(e)}")
+
+
+# -----------------------------------------
+# Readers
+# -----------------------------------------
+def _build_from_db(session, doctor_ids, dates):
+    bitmaps = {(doctor_id, date): 0 for doctor_id in doctor_ids for date in dates}
+    if not bitmaps:
+        return bitmaps
+
+    for row in session.query(
+        AvailabilitySlot.doctor_id,
+        AvailabilitySlot.date,
+        AvailabilitySlot.start_time,
+        AvailabilitySlot.end_time,
+    ).filter(
+        AvailabilitySlot.doctor_id.in_(list(doctor_ids)),
+        AvailabilitySlot.date.between(min(dates), max(dates)),
+        AvailabilitySlot.is_booked == false(),
+    ):
+        key = (row.doctor_id, row.date)
+        if key in bitmaps:
+            bitmaps[key] |= _mask(*_granule_range(row.start_time, row.end_time))
+
+    return bitmaps
+
+
+def load_availability_bitmaps(session, doctor_ids, dates):
+    """{(doctor_id, date): int} for every pair, from Redis where present."""
+    pairs = [(doctor_id, date) for doctor_id in doctor_ids for date in dates]
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for doctor_id, date in pairs:
+            key = _bitmap_key(doctor_id, date)
+            pipe.exists(key)
+            pipe.execute_command("BITFIELD", key, *_GET_WORDS)
+            pipe.get(_generation_key(doctor_id, date))
+        replies = pipe.execute()
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Availability bitmaps unavailable | error={str(e)}")
+        return _build_from_db(session, doctor_ids, dates)
+
+    bitmaps, generations = {}, {}
+    for i, pair in enumerate(pairs):
+        exists, words, generation = replies[3 * i : 3 * i + 3]
+        if exists:
+            bitmaps[pair] = _from_words(words)
+        else:
+            generations[pair] = generation or "0"
+
+    if not generations:
+        return bitmaps
+
+    missing_doctors = sorted({doctor_id for doctor_id, _ in generations})
+    missing_dates = sorted({date for _, date in generations})
+    built = _build_from_db(session, missing_doctors, missing_dates)
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for (doctor_id, date), generation in generations.items():
+            _FILL_SCRIPT(
+                keys=[_bitmap_key(doctor_id, date), _generation_key(doctor_id, date)],
+                args=[generation, AVAILABILITY_BITMAP_TTL]
+                + _words(built[(doctor_id, date)]),
+                client=pipe,
+            )
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Availability bitmap fill failed | error={str(e)}")
+
+    for pair in generations:
+        bitmaps[pair] = built[pair]
+
+    return bitmaps
+
+
+def _first_run(bits, length, not_before=0):
+    """Earliest granule starting `length` consecutive set bits, or None."""
+    runs = bits
+    for shift in range(1, length):
+        runs &= bits << shift
+
+    runs &= (1 << (GRANULES - not_before)) - 1
+    if not runs:
+        return None
+
+    return GRANULES - runs.bit_length()
+
+
+def _resolve_doctor_ids(session, department_id, doctor_ids):
+    if doctor_ids:
+        return sorted({int(d) for d in doctor_ids})
+
+    if department_id is None:
+        raise ValueError("department_id or doctor_ids is required")
+
+    return [
+        row.id
+        for row in session.query(Doctor.id)
+        .filter(Doctor.department_id == int(department_id))
+        .order_by(Doctor.id)
+    ]
+
+
+def _parse_time(value):
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except (TypeError, ValueError):
+            continue
+
+    raise ValueError(f"Invalid time: {value}")
+
+
+# -----------------------------------------
+# Who is free for the whole window on a date?
+# -----------------------------------------
+def find_free_doctors_service(
+    date, start_time, end_time, department_id=None, doctor_ids=None
+):
+    session = get_db_session()
+
+    try:
+        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
+        start_obj = _parse_time(start_time)
+        end_obj = _parse_time(end_time)
+
+        if start_obj >= end_obj:
+            raise ValueError("End time must be after start time")
+
+        doctor_ids = _resolve_doctor_ids(session, department_id, doctor_ids)
+        bitmaps = load_availability_bitmaps(session, doctor_ids, [date_obj])
+        window = _mask(*_granule_range(start_obj, end_obj, outward=True))
+
+        return {
+            "date": str(date_obj),
+            "start_time": str(start_obj),
+            "end_time": str(end_obj),
+            "doctor_ids": [
+                doctor_id
+                for doctor_id in doctor_ids
+                if bitmaps[(doctor_id, date_obj)] & window == window
+            ],
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Earliest window of `duration_minutes`
+#   mode="all": every doctor free at once (AND of their bitmaps)
+#   mode="any": the first doctor with a long enough free run
+# -----------------------------------------
+def find_earliest_window_service(
+    date_from,
+    duration_minutes,
+    date_to=None,
+    after_time=None,
+    department_id=None,
+    doctor_ids=None,
+    mode="all",
+):
+    session = get_db_session()
+
+    try:
+        first_date = datetime.strptime(date_from, "%Y-%m-%d").date()
+        last_date = (
+            datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else first_date
+        )
+        duration_minutes = int(duration_minutes)
+
+        if mode not in ("all", "any"):
+            raise ValueError("mode must be 'all' or 'any'")
+
+        if duration_minutes <= 0:
+            raise ValueError("Duration must be greater than 0")
+
+        if last_date < first_date:
+            raise ValueError("date_to must not be before date_from")
+
+        if (last_date - first_date).days >= MAX_SEARCH_DAYS:
+            raise ValueError(f"Search at most {MAX_SEARCH_DAYS} days at a time")
+
+        not_before = 0
+        if after_time:
+            not_before = -(-_minutes(_parse_time(after_time)) // GRANULE_MINUTES)
+
+        doctor_ids = _resolve_doctor_ids(session, department_id, doctor_ids)
+        if not doctor_ids:
+            return None
+
+        dates = [
+            first_date + timedelta(days=i)
+            for i in range((last_date - first_date).days + 1)
+        ]
+        bitmaps = load_availability_bitmaps(session, doctor_ids, dates)
+        length = -(-duration_minutes // GRANULE_MINUTES)
+
+        for date in dates:
+            floor = not_before if date == first_date else 0
+
+            if mode == "all":
+                combined = -1
+                for doctor_id in doctor_ids:
+                    combined &= bitmaps[(doctor_id, date)]
+                start = _first_run(combined, length, floor)
+                free_doctors = doctor_ids
+            else:
+                starts = {
+                    doctor_id: _first_run(bitmaps[(doctor_id, date)], length, floor)
+                    for doctor_id in doctor_ids
+                }
+                found = [s for s in starts.values() if s is not None]
+                start = min(found) if found else None
+                free_doctors = [d for d, s in starts.items() if s == start]
+
+            if start is not None:
+                return {
+                    "date": str(date),
+                    "start_time": str(_granule_time(start)),
+                    "end_time": str(_granule_time(start + length)),
+                    "doctor_ids": free_doctors,
+                }
+
+        return None
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
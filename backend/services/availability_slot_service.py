@@ -1,9 +1,32 @@
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import and_
+from sqlalchemy import insert
 from datetime import datetime, timedelta
 from backend.models.availability_slot import AvailabilitySlot
 from backend.models.doctor import Doctor
+from backend.models.doctor_schedule import DoctorSchedule
+from backend.models.slot_materialization import SlotMaterialization
+from backend.services.availability_bitmap import (
+    drop_availability_bitmaps,
+    mark_slot_free,
+)
+from backend.services.slot_cache import invalidate_available_slots
+from backend.services.slot_interval_index import load_slot_indexes
 from backend.utils.db import get_db_session
+import hashlib
+import os
+
+SLOT_INSERT_CHUNK_SIZE = int(os.getenv("SLOT_INSERT_CHUNK_SIZE", 1000))
+
+
+def _parse_time(value):
+    """HH:MM or HH:MM:SS"""
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except (TypeError, ValueError):
+            continue
+
+    raise ValueError(f"Invalid time: {value}")
 
 
 # -----------------------------------------
@@ -16,8 +39,8 @@ def create_slot_service(doctor_id, date, start_time, end_time):
         doctor_id = int(doctor_id)
 
         date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        start_obj = datetime.strptime(start_time, "%H:%M").time()
-        end_obj = datetime.strptime(end_time, "%H:%M").time()
+        start_obj = _parse_time(start_time)
+        end_obj = _parse_time(end_time)
 
         if start_obj >= end_obj:
             raise ValueError("End time must be after start time")
@@ -26,20 +49,9 @@ def create_slot_service(doctor_id, date, start_time, end_time):
         if not doctor:
             raise ValueError("Doctor not found")
 
-        overlap = (
-            session.query(AvailabilitySlot)
-            .filter(
-                AvailabilitySlot.doctor_id == doctor_id,
-                AvailabilitySlot.date == date_obj,
-                and_(
-                    AvailabilitySlot.start_time < end_obj,
-                    AvailabilitySlot.end_time > start_obj,
-                ),
-            )
-            .first()
-        )
+        index = load_slot_indexes(session, [doctor_id], date_obj)[(doctor_id, date_obj)]
 
-        if overlap:
+        if index.overlaps(start_obj, end_obj):
             raise ValueError("Slot overlaps with existing slot")
 
         new_slot = AvailabilitySlot(
@@ -54,6 +66,9 @@ def create_slot_service(doctor_id, date, start_time, end_time):
         session.commit()
         session.refresh(new_slot)
 
+        invalidate_available_slots(doctor_id, [date_obj])
+        mark_slot_free(doctor_id, date_obj, start_obj, end_obj)
+
         return {
             "slot_id": new_slot.id,
             "doctor_id": doctor_id,
@@ -70,11 +85,51 @@ def create_slot_service(doctor_id, date, start_time, end_time):
         session.close()
 
 
+# -----------------------------------------
+# Set-based helpers for the generators
+# -----------------------------------------
+def _generate_intervals(date_obj, start_time, end_time, slot_duration_minutes):
+    """Back-to-back (start, end) times of the given length within the window."""
+    start_datetime = datetime.combine(date_obj, start_time)
+    end_datetime = datetime.combine(date_obj, end_time)
+    step = timedelta(minutes=slot_duration_minutes)
+
+    intervals = []
+    current_time = start_datetime
+
+    while current_time + step <= end_datetime:
+        intervals.append((current_time.time(), (current_time + step).time()))
+        current_time += step
+
+    return intervals
+
+
+def _insert_slots_ignoring_duplicates(session, rows):
+    """
+    One multi-row INSERT for all new slots. A row that a concurrent writer
+    created in the meantime hits unique_doctor_slot and is skipped instead
+    of failing the batch.
+    """
+    if not rows:
+        return
+
+    stmt = (
+        insert(AvailabilitySlot)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    session.execute(stmt, rows)
+
+
 # -----------------------------------------
 # Bulk Slot Creation (Auto Interval Generator)
+#
+# One SELECT for the doctor's existing slots that day, overlap checks in
+# memory, one multi-row INSERT - instead of a probe query per interval.
+# dry_run=True reports what would be created without writing.
 # -----------------------------------------
 def create_bulk_slots_service(
-    doctor_id, date, start_time, end_time, slot_duration_minutes
+    doctor_id, date, start_time, end_time, slot_duration_minutes, dry_run=False
 ):
     session = get_db_session()
 
@@ -86,64 +141,57 @@ def create_bulk_slots_service(
             raise ValueError("Slot duration must be greater than 0")
 
         date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        start_datetime = datetime.strptime(f"{date} {start_time}", "%Y-%m-%d %H:%M")
-        end_datetime = datetime.strptime(f"{date} {end_time}", "%Y-%m-%d %H:%M")
+        start_obj = _parse_time(start_time)
+        end_obj = _parse_time(end_time)
 
-        if start_datetime >= end_datetime:
+        if start_obj >= end_obj:
             raise ValueError("End time must be after start time")
 
         doctor = session.query(Doctor).filter(Doctor.id == doctor_id).first()
         if not doctor:
             raise ValueError("Doctor not found")
 
-        current_time = start_datetime
-        created_slots = []
-
-        while current_time < end_datetime:
-            next_time = current_time + timedelta(minutes=slot_duration_minutes)
-
-            if next_time > end_datetime:
-                break
-
-            overlap = (
-                session.query(AvailabilitySlot)
-                .filter(
-                    AvailabilitySlot.doctor_id == doctor_id,
-                    AvailabilitySlot.date == date_obj,
-                    and_(
-                        AvailabilitySlot.start_time < next_time.time(),
-                        AvailabilitySlot.end_time > current_time.time(),
-                    ),
-                )
-                .first()
-            )
-
-            if not overlap:
-                slot = AvailabilitySlot(
-                    doctor_id=doctor_id,
-                    date=date_obj,
-                    start_time=current_time.time(),
-                    end_time=next_time.time(),
-                    is_booked=False,
-                )
-                session.add(slot)
+        index = load_slot_indexes(session, [doctor_id], date_obj)[(doctor_id, date_obj)]
+        free, conflicting = index.claim(
+            _generate_intervals(date_obj, start_obj, end_obj, slot_duration_minutes)
+        )
 
-                created_slots.append(
-                    {
-                        "start_time": str(current_time.time()),
-                        "end_time": str(next_time.time()),
-                    }
-                )
+        result = {
+            "doctor_id": doctor_id,
+            "date": str(date_obj),
+            "slots_created": [
+                {"start_time": str(start), "end_time": str(end)} for start, end in free
+            ],
+            "conflicts": [
+                {"start_time": str(start), "end_time": str(end)}
+                for start, end in conflicting
+            ],
+        }
 
-            current_time = next_time
+        if dry_run:
+            return {**result, "dry_run": True}
+
+        _insert_slots_ignoring_duplicates(
+            session,
+            [
+                {
+                    "doctor_id": doctor_id,
+                    "date": date_obj,
+                    "start_time": start,
+                    "end_time": end,
+                    "is_booked": False,
+                }
+                for start, end in free
+            ],
+        )
 
         session.commit()
 
-        return {
-            "doctor_id": doctor_id,
-            "date": str(date_obj),
-            "slots_created": created_slots,
-        }
+        if free:
+            invalidate_available_slots(doctor_id, [date_obj])
+            drop_availability_bitmaps(doctor_id, [date_obj])
+
+        return result
 
     except SQLAlchemyError:
         session.rollback()
@@ -154,87 +202,299 @@ def create_bulk_slots_service(
 
 # -----------------------------------------
 # Weekly Slot Generator
+#
+# One range query loads every existing slot for all requested doctors
+# across the whole horizon; missing intervals are computed in memory and
+# inserted in chunks of `chunk_size` rows, each chunk its own commit, so
+# long horizons never hold one huge transaction. dry_run=True stops after
+# the in-memory pass and returns the same per-date report.
 # -----------------------------------------
 def create_weekly_slots_service(
-    doctor_id, weekday, number_of_weeks, start_time, end_time, slot_duration_minutes
+    doctor_id=None,
+    weekday=None,
+    number_of_weeks=None,
+    start_time=None,
+    end_time=None,
+    slot_duration_minutes=None,
+    doctor_ids=None,
+    weekdays=None,
+    chunk_size=SLOT_INSERT_CHUNK_SIZE,
+    dry_run=False,
 ):
     """
     weekday: 0=Monday ... 6=Sunday
+    doctor_ids / weekdays generate for several doctors and weekdays at once
+    (doctor_id / weekday remain accepted for a single one).
     """
 
     session = get_db_session()
 
     try:
-        doctor_id = int(doctor_id)
-        weekday = int(weekday)
+        doctor_ids = sorted({int(d) for d in (doctor_ids or [doctor_id]) if d})
+        weekdays = sorted({int(w) for w in (weekdays or [weekday]) if w is not None})
         number_of_weeks = int(number_of_weeks)
         slot_duration_minutes = int(slot_duration_minutes)
+        chunk_size = int(chunk_size)
 
-        if weekday < 0 or weekday > 6:
+        if not doctor_ids:
+            raise ValueError("At least one doctor is required")
+
+        if not weekdays or any(w < 0 or w > 6 for w in weekdays):
             raise ValueError("Weekday must be between 0 (Mon) and 6 (Sun)")
 
-        doctor = session.query(Doctor).filter(Doctor.id == doctor_id).first()
-        if not doctor:
-            raise ValueError("Doctor not found")
+        if number_of_weeks <= 0:
+            raise ValueError("Number of weeks must be greater than 0")
 
-        today = datetime.today().date()
-        days_ahead = (weekday - today.weekday() + 7) % 7
-        first_date = today + timedelta(days=days_ahead)
+        if slot_duration_minutes <= 0:
+            raise ValueError("Slot duration must be greater than 0")
 
-        created_summary = []
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be greater than 0")
 
-        for week in range(number_of_weeks):
-            current_date = first_date + timedelta(weeks=week)
+        start_obj = _parse_time(start_time)
+        end_obj = _parse_time(end_time)
 
-            start_datetime = datetime.strptime(
-                f"{current_date} {start_time}", "%Y-%m-%d %H:%M"
-            )
-            end_datetime = datetime.strptime(
-                f"{current_date} {end_time}", "%Y-%m-%d %H:%M"
-            )
+        if start_obj >= end_obj:
+            raise ValueError("End time must be after start time")
 
-            current_time = start_datetime
+        found = {
+            row.id for row in session.query(Doctor.id).filter(Doctor.id.in_(doctor_ids))
+        }
+        missing_doctors = [d for d in doctor_ids if d not in found]
+        if missing_doctors:
+            raise ValueError(f"Doctor not found: {missing_doctors}")
 
-            while current_time < end_datetime:
-                next_time = current_time + timedelta(minutes=slot_duration_minutes)
+        today = datetime.today().date()
+        dates = sorted(
+            today + timedelta(days=(w - today.weekday() + 7) % 7, weeks=week)
+            for w in weekdays
+            for week in range(number_of_weeks)
+        )
 
-                if next_time > end_datetime:
-                    break
+        indexes = load_slot_indexes(session, doctor_ids, dates[0], dates[-1])
+
+        per_date = []
+        chunk, touched = [], {}
+
+        def flush():
+            _insert_slots_ignoring_duplicates(session, chunk)
+            session.commit()
+            # One cache and one bitmap pipeline per doctor, not per date
+            for touched_doctor_id, touched_dates in touched.items():
+                invalidate_available_slots(touched_doctor_id, sorted(touched_dates))
+                drop_availability_bitmaps(touched_doctor_id, sorted(touched_dates))
+            chunk.clear()
+            touched.clear()
+
+        for current_doctor_id in doctor_ids:
+            for current_date in dates:
+                candidates = _generate_intervals(
+                    current_date, start_obj, end_obj, slot_duration_minutes
+                )
+                free, _ = indexes[(current_doctor_id, current_date)].claim(candidates)
 
-                overlap = (
-                    session.query(AvailabilitySlot)
-                    .filter(
-                        AvailabilitySlot.doctor_id == doctor_id,
-                        AvailabilitySlot.date == current_date,
-                        and_(
-                            AvailabilitySlot.start_time < next_time.time(),
-                            AvailabilitySlot.end_time > current_time.time(),
-                        ),
-                    )
-                    .first()
+                per_date.append(
+                    {
+                        "doctor_id": current_doctor_id,
+                        "date": str(current_date),
+                        "created": len(free),
+                        "skipped": len(candidates) - len(free),
+                    }
                 )
 
-                if not overlap:
-                    slot = AvailabilitySlot(
-                        doctor_id=doctor_id,
-                        date=current_date,
-                        start_time=current_time.time(),
-                        end_time=next_time.time(),
-                        is_booked=False,
+                for start, end in free:
+                    chunk.append(
+                        {
+                            "doctor_id": current_doctor_id,
+                            "date": current_date,
+                            "start_time": start,
+                            "end_time": end,
+                            "is_booked": False,
+                        }
                     )
-                    session.add(slot)
+                    touched.setdefault(current_doctor_id, set()).add(current_date)
 
-                current_time = next_time
+                    if len(chunk) >= chunk_size and not dry_run:
+                        flush()
 
-            created_summary.append(str(current_date))
-
-        session.commit()
+        if chunk and not dry_run:
+            flush()
 
         return {
-            "doctor_id": doctor_id,
-            "weekday": weekday,
+            "doctor_id": doctor_ids[0] if len(doctor_ids) == 1 else None,
+            "doctor_ids": doctor_ids,
+            "weekday": weekdays[0] if len(weekdays) == 1 else None,
+            "weekdays": weekdays,
             "weeks_created": number_of_weeks,
-            "dates_generated": created_summary,
+            "dates_generated": [str(d) for d in dates],
+            "created": sum(entry["created"] for entry in per_date),
+            "skipped": sum(entry["skipped"] for entry in per_date),
+            "per_date": per_date,
+            **({"dry_run": True} if dry_run else {}),
+        }
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Rolling-horizon materializer (DoctorSchedule -> availability_slots)
+#
+# Keeps the next `horizon_days` days of slots generated for every doctor
+# with a schedule. SlotMaterialization stores, per doctor, how far slots
+# exist and a hash of the schedule they came from:
+#   - schedule unchanged: only days after the high-water mark are built,
+#     so a nightly run costs O(new days)
+#   - schedule changed (or first run): the whole horizon is rebuilt from
+#     today; existing slots are kept and only missing intervals added
+# Slots from a previous schedule are never deleted (they may be booked).
+# -----------------------------------------
+def _schedule_hash(schedules):
+    key = sorted(
+        (day_of_week, str(start), str(end), minutes)
+        for day_of_week, start, end, minutes in schedules
+    )
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def materialize_slots_service(
+    horizon_days, today=None, chunk_size=SLOT_INSERT_CHUNK_SIZE
+):
+    session = get_db_session()
+
+    try:
+        horizon_days = int(horizon_days)
+        if horizon_days <= 0:
+            raise ValueError("Horizon must be at least one day")
+
+        today = today or datetime.today().date()
+        last_day = today + timedelta(days=horizon_days - 1)
+
+        # Plain tuples: ORM rows would expire (and reload) on every commit
+        schedules_by_doctor = {}
+        for row in session.query(
+            DoctorSchedule.doctor_id,
+            DoctorSchedule.day_of_week,
+            DoctorSchedule.start_time,
+            DoctorSchedule.end_time,
+            DoctorSchedule.slot_duration,
+        ).order_by(DoctorSchedule.doctor_id, DoctorSchedule.start_time):
+            schedules_by_doctor.setdefault(row.doctor_id, []).append(
+                (row.day_of_week, row.start_time, row.end_time, row.slot_duration)
+            )
+
+        marks = {
+            mark.doctor_id: mark
+            for mark in session.query(SlotMaterialization).filter(
+                SlotMaterialization.doctor_id.in_(list(schedules_by_doctor))
+            )
+        }
+
+        # Doctors grouped by the first day they need, so each group costs
+        # one range query for its existing slots
+        plans = {}
+        for doctor_id, schedules in schedules_by_doctor.items():
+            schedule_hash = _schedule_hash(schedules)
+            mark = marks.get(doctor_id)
+
+            if mark and mark.schedule_hash == schedule_hash:
+                first_day = max(mark.materialized_through + timedelta(days=1), today)
+            else:
+                first_day = today
+
+            if first_day <= last_day:
+                plans.setdefault(first_day, []).append((doctor_id, schedule_hash))
+
+        summary = {"doctors": 0, "days": 0, "created": 0, "skipped": 0}
+
+        rows, touched, done = [], {}, []
+
+        def flush():
+            for i in range(0, len(rows), chunk_size):
+                _insert_slots_ignoring_duplicates(session, rows[i : i + chunk_size])
+
+            for doctor_id, schedule_hash in done:
+                mark = marks.get(doctor_id)
+                if mark is None:
+                    mark = marks[doctor_id] = SlotMaterialization(doctor_id=doctor_id)
+                    session.add(mark)
+                mark.materialized_through = last_day
+                mark.schedule_hash = schedule_hash
+
+            # A doctor's slots and its mark land in the same commit, so
+            # a crash resumes from the last committed mark
+            session.commit()
+
+            for doctor_id, dates in touched.items():
+                invalidate_available_slots(doctor_id, sorted(dates))
+                drop_availability_bitmaps(doctor_id, sorted(dates))
+
+            summary["doctors"] += len(done)
+            summary["created"] += len(rows)
+            rows.clear()
+            touched.clear()
+            done.clear()
+
+        for first_day, doctors in sorted(plans.items()):
+            doctor_ids = [doctor_id for doctor_id, _ in doctors]
+
+            indexes = load_slot_indexes(session, doctor_ids, first_day, last_day)
+
+            for doctor_id, schedule_hash in doctors:
+                current_date = first_day
+
+                while current_date <= last_day:
+                    index = indexes[(doctor_id, current_date)]
+
+                    for (
+                        day_of_week,
+                        start_time,
+                        end_time,
+                        minutes,
+                    ) in schedules_by_doctor[doctor_id]:
+                        if day_of_week != current_date.weekday():
+                            continue
+
+                        candidates = _generate_intervals(
+                            current_date, start_time, end_time, minutes
+                        )
+                        # claim() adds free slots to the index, so an
+                        # overlapping schedule row cannot double them up
+                        free, _ = index.claim(candidates)
+
+                        summary["skipped"] += len(candidates) - len(free)
+                        rows.extend(
+                            {
+                                "doctor_id": doctor_id,
+                                "date": current_date,
+                                "start_time": start,
+                                "end_time": end,
+                                "is_booked": False,
+                            }
+                            for start, end in free
+                        )
+                        if free:
+                            touched.setdefault(doctor_id, set()).add(current_date)
+
+                    summary["days"] += 1
+                    current_date += timedelta(days=1)
+
+                done.append((doctor_id, schedule_hash))
+
+                # Commit whole doctors, roughly chunk_size rows at a time
+                if len(rows) >= chunk_size:
+                    flush()
+
+            if done:
+                flush()
+
+        return {
+            "horizon_days": horizon_days,
+            "through": str(last_day),
+            **summary,
         }
 
     except SQLAlchemyError:
@@ -0,0 +1,157 @@
+import os
+import time
+import redis
+from backend.utils.metrics import CallbackMetric, Counter, Histogram
+from backend.utils.redis_client import redis_client
+
+# -------------------------------------------------
+# Billing pipeline metrics
+#
+# Counters/histograms are per process (API or worker). Queue depth, dedup
+# hits and the invoicing lag are read from Redis / the DB at scrape time,
+# so every endpoint reports the same cluster-wide values for those. The
+# invoicing lag is a full count, so it is cached for
+# BILLING_UNINVOICED_TTL seconds in each process and in Redis: the whole
+# cluster runs it about once per TTL, whatever the number of scrapers.
+#
+# Alert on billing_uninvoiced_appointments growing, or on
+# rate(billing_jobs_enqueued_total) outpacing
+# rate(billing_jobs_settled_total{outcome="acked"}).
+# -------------------------------------------------
+ENQUEUE_SECONDS = Histogram(
+    "billing_enqueue_seconds",
+    "Time to push a batch of billing jobs to Redis (or the local spool)",
+)
+
+JOBS_ENQUEUED = Counter(
+    "billing_jobs_enqueued_total",
+    "Billing jobs handed to enqueue_billing_jobs, by result",
+    ["result"],  # queued | duplicate | spooled
+)
+
+JOB_SECONDS = Histogram(
+    "billing_job_seconds",
+    "Time to invoice one job (single-job and async workers)",
+)
+
+BATCH_SECONDS = Histogram(
+    "billing_batch_seconds",
+    "Time to invoice one batch of jobs (batch workers)",
+)
+
+JOBS_SETTLED = Counter(
+    "billing_jobs_settled_total",
+    "Reserved billing jobs by outcome",
+    ["outcome"],  # acked | retried | dead
+)
+
+JOB_FAILURES = Counter(
+    "billing_job_failures_total",
+    "Failed billing jobs by reason (exception class)",
+    ["reason"],
+)
+
+UNINVOICED_KEY = "billing_queue:stats:uninvoiced"
+UNINVOICED_TTL = int(os.getenv("BILLING_UNINVOICED_TTL", 60))  # seconds
+
+INVOICE_IDEMPOTENT_HITS = Counter(
+    "billing_invoice_idempotent_hits_total",
+    "Invoices that already existed when a job ran",
+    ["source"],  # existing (idempotency check) | integrity_error (lost a race)
+)
+
+
+def record_settlement(outcome, error=None):
+    JOBS_SETTLED.inc(outcome=outcome)
+    if error is not None:
+        JOB_FAILURES.inc(reason=type(error).__name__)
+
+
+def _queue_depth():
+    from backend.services.billing_queue import billing_backlog
+
+    return billing_backlog()
+
+
+def _dedup_hits():
+    from backend.services.billing_queue import get_dedup_hits
+
+    return get_dedup_hits()
+
+
+def _spooled_batches():
+    from backend.services.billing_spool import spooled_count
+
+    return spooled_count()
+
+
+def _count_uninvoiced():
+    from sqlalchemy import func
+    from backend.models.appointment import Appointment
+    from backend.models.invoice import Invoice
+    from backend.utils.db import get_db_session
+
+    session = get_db_session()
+    try:
+        return (
+            session.query(func.count(Appointment.id))
+            .outerjoin(Invoice, Invoice.appointment_id == Appointment.id)
+            .filter(Appointment.status == "completed", Invoice.id.is_(None))
+            .scalar()
+        )
+    finally:
+        session.close()
+
+
+_uninvoiced_cache = {"value": None, "expires": 0.0}
+
+
+def _uninvoiced_appointments():
+    now = time.monotonic()
+    if _uninvoiced_cache["expires"] > now:
+        return _uninvoiced_cache["value"]
+
+    value = None
+    try:
+        cached = redis_client.get(UNINVOICED_KEY)
+        if cached is not None:
+            value = int(cached)
+    except redis.exceptions.RedisError:
+        pass  # Count from the DB; the local cache still bounds the rate
+
+    if value is None:
+        value = _count_uninvoiced()
+        try:
+            redis_client.set(UNINVOICED_KEY, value, ex=UNINVOICED_TTL)
+        except redis.exceptions.RedisError:
+            pass
+
+    _uninvoiced_cache.update(value=value, expires=now + UNINVOICED_TTL)
+    return value
+
+
+QUEUE_DEPTH = CallbackMetric(
+    "billing_queue_depth",
+    "Billing jobs by state (pending = LLEN billing_queue / stream lag)",
+    _queue_depth,
+    ["state"],
+)
+
+DEDUP_HITS = CallbackMetric(
+    "billing_dedup_hits_total",
+    "Enqueues skipped because the appointment was already queued",
+    _dedup_hits,
+    kind="counter",
+)
+
+SPOOLED_BATCHES = CallbackMetric(
+    "billing_spooled_batches",
+    "Enqueue batches waiting in this host's local spool for Redis",
+    _spooled_batches,
+)
+
+UNINVOICED_APPOINTMENTS = CallbackMetric(
+    "billing_uninvoiced_appointments",
+    "Completed appointments that have no invoice yet (cached, see UNINVOICED_TTL)",
+    _uninvoiced_appointments,
+)
@@ -1,62 +1,789 @@
 import json
+import os
+import socket
+import threading
+import time
 import redis
 from datetime import datetime
-from time import sleep
-
-# Redis client with better reliability settings
-redis_client = redis.Redis(
-    host="localhost",
-    port=6379,
-    decode_responses=True,
-    socket_connect_timeout=5,
-    socket_timeout=5,
-    retry_on_timeout=True,
-)
+from backend.services.billing_metrics import ENQUEUE_SECONDS, JOBS_ENQUEUED
+from backend.services.billing_spool import spool_billing_jobs
+from backend.utils.redis_client import redis_client
 
 BILLING_QUEUE = "billing_queue"
+BILLING_PROCESSING_PREFIX = "billing_queue:processing:"
+BILLING_WORKERS = "billing_queue:workers"
+BILLING_DEAD_QUEUE = "billing_queue:dead"
+BILLING_SCHEDULED = "billing_queue:scheduled"  # ZSET job -> due timestamp
+
+# A worker that has not heartbeated for this long is considered dead and
+# its in-flight jobs are handed back to the queue by the reaper.
+VISIBILITY_TIMEOUT = int(os.getenv("BILLING_VISIBILITY_TIMEOUT", 60))  # seconds
+MAX_ATTEMPTS = int(os.getenv("BILLING_MAX_ATTEMPTS", 5))
+RETRY_BASE_DELAY = float(os.getenv("BILLING_RETRY_BASE_DELAY", 5))  # seconds
+RETRY_MAX_DELAY = 300  # seconds
+ENQUEUE_CHUNK_SIZE = 1000  # values per RPUSH inside one pipeline
+
+# "list" (default) or "stream". The stream transport lets many hosts share
+# the work through one consumer group with per-consumer pending tracking.
+BILLING_TRANSPORT = os.getenv("BILLING_TRANSPORT", "list")
+BILLING_STREAM = "billing_stream"
+BILLING_GROUP = "billing_workers"
+# Approximate cap on stream length. Trimming ignores ack state, so this
+# must stay well above the worst-case backlog.
+BILLING_STREAM_MAXLEN = int(os.getenv("BILLING_STREAM_MAXLEN", 1_000_000))
+
+# Enqueue-side dedup: one marker per appointment while its job is queued
+# or in flight; cleared once the invoice commits (or the job dies).
+# BILLING_DEDUP_TTL=0 disables it.
+BILLING_DEDUP_PREFIX = "billing_queue:dedup:"
+BILLING_DEDUP_HITS = "billing_queue:stats:dedup_hits"
+BILLING_DEDUP_TTL = int(os.getenv("BILLING_DEDUP_TTL", 3600))  # seconds
+
+# KEYS = [queue or stream, dedup hit counter, dedup key 1..n]
+# ARGV = [ttl, transport, stream maxlen, job 1..n]
+# Claiming the marker and queueing the job happen atomically, so a failed
+# push can never leave a marker behind that would swallow the retry.
+_ENQUEUE_DEDUP_SCRIPT = redis_client.register_script(
+    """
+local queued = 0
+for i = 3, #KEYS do
+    if redis.call('SET', KEYS[i], '1', 'NX', 'EX', ARGV[1]) then
+        local job = ARGV[i + 1]
+        if ARGV[2] == 'stream' then
+            redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'job', job)
+        else
+            redis.call('RPUSH', KEYS[1], job)
+        end
+        queued = queued + 1
+    end
+end
+local hits = #KEYS - 2 - queued
+if hits > 0 then
+    redis.call('INCRBY', KEYS[2], hits)
+end
+return queued
+"""
+)
+
+# KEYS = [scheduled zset, queue or stream]
+# ARGV = [now, max jobs, transport, stream maxlen]
+_PROMOTE_SCRIPT = redis_client.register_script(
+    """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    if ARGV[3] == 'stream' then
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', 'job', job)
+    else
+        redis.call('RPUSH', KEYS[2], job)
+    end
+end
+return #due
+"""
+)
+
+# KEYS = [processing list or stream, dedup key (optional)]
+# ARGV = [transport, receipt, group]
+# The dedup marker is only released if this call removed the job: once the
+# reaper has rescheduled it, the marker belongs to the live retry.
+ACK_SCRIPT_SOURCE = """
+local removed
+if ARGV[1] == 'stream' then
+    removed = redis.call('XACK', KEYS[1], ARGV[3], ARGV[2])
+else
+    removed = redis.call('LREM', KEYS[1], 1, ARGV[2])
+end
+if removed == 1 and KEYS[2] then
+    redis.call('DEL', KEYS[2])
+end
+return removed
+"""
+_ACK_SCRIPT = redis_client.register_script(ACK_SCRIPT_SOURCE)
+
+# KEYS = [stream, dead list or scheduled zset, dedup key (dead, optional)]
+# ARGV = [group, entry id, "dead" or "retry", payload, due timestamp (retry)]
+# The follow-up write only happens if this XACK settled the entry.
+_SETTLE_STREAM_SCRIPT = redis_client.register_script(
+    """
+if redis.call('XACK', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+if ARGV[3] == 'dead' then
+    redis.call('RPUSH', KEYS[2], ARGV[4])
+    if KEYS[3] then
+        redis.call('DEL', KEYS[3])
+    end
+else
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[4])
+end
+return 1
+"""
+)
+
+# KEYS = [dead list, queue or stream, dedup hit counter, dedup key (optional)]
+# ARGV = [dead entry, job ('' if unparseable), transport, stream maxlen, ttl]
+# Takes one dead entry out and requeues it in one step, so a crash can
+# never lose it. Unparseable entries go back to the tail of the dead list;
+# jobs whose appointment is already queued or in flight are dropped as
+# dedup hits.
+_REPLAY_DEAD_SCRIPT = redis_client.register_script(
+    """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+    return 0
+end
+if KEYS[4] and not redis.call('SET', KEYS[4], '1', 'NX', 'EX', ARGV[5]) then
+    redis.call('INCR', KEYS[3])
+    return 0
+end
+if ARGV[3] == 'stream' then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', 'job', ARGV[2])
+else
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+return 1
+"""
+)
+
+
+def _push_jobs(pipe, jobs):
+    """Queue serialized jobs on `pipe` using the configured transport."""
+    if BILLING_TRANSPORT == "stream":
+        for job_json in jobs:
+            pipe.xadd(
+                BILLING_STREAM,
+                {"job": job_json},
+                maxlen=BILLING_STREAM_MAXLEN,
+                approximate=True,
+            )
+        return
+
+    for start in range(0, len(jobs), ENQUEUE_CHUNK_SIZE):
+        pipe.rpush(BILLING_QUEUE, *jobs[start : start + ENQUEUE_CHUNK_SIZE])
+
+
+def _dedup_key(appointment_id):
+    return f"{BILLING_DEDUP_PREFIX}{appointment_id}"
+
+
+def _job_appointment_id(job_json):
+    try:
+        return json.loads(job_json).get("appointment_id")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _push_jobs_dedup(pipe, appointment_ids, jobs):
+    """Queue only appointments that have no job queued/in flight yet."""
+    target = BILLING_STREAM if BILLING_TRANSPORT == "stream" else BILLING_QUEUE
+
+    for start in range(0, len(jobs), ENQUEUE_CHUNK_SIZE):
+        chunk_ids = appointment_ids[start : start + ENQUEUE_CHUNK_SIZE]
+        _ENQUEUE_DEDUP_SCRIPT(
+            keys=[target, BILLING_DEDUP_HITS] + [_dedup_key(i) for i in chunk_ids],
+            args=[BILLING_DEDUP_TTL, BILLING_TRANSPORT, BILLING_STREAM_MAXLEN]
+            + jobs[start : start + ENQUEUE_CHUNK_SIZE],
+            client=pipe,
+        )
+
+
+def _dedup_keys(job_json):
+    """[dedup key] of a job, or [] if it carries no usable appointment id."""
+    appointment_id = _job_appointment_id(job_json)
+
+    if not isinstance(appointment_id, int):
+        return []
+
+    return [_dedup_key(appointment_id)]
+
+
+def clear_billing_dedup(job_json, pipe=None):
+    """Release the dedup marker of a settled job (queued on `pipe` if given)."""
+    appointment_id = _job_appointment_id(job_json)
+
+    if not isinstance(appointment_id, int):
+        return
+
+    (pipe or redis_client).delete(_dedup_key(appointment_id))
+
+
+def get_dedup_hits():
+    return int(redis_client.get(BILLING_DEDUP_HITS) or 0)
+
+
+def _validate_appointment_id(appointment_id):
+    if not isinstance(appointment_id, int) or appointment_id <= 0:
+        raise ValueError("Invalid appointment_id")
 
 
 def enqueue_billing_job(appointment_id):
     """
     Push a billing job into Redis queue.
+    """
+
+    _validate_appointment_id(appointment_id)
+
+    enqueue_billing_jobs([appointment_id])
+
+
+def enqueue_billing_jobs(appointment_ids):
+    """
+    Push many billing jobs in a single pipelined round trip.
 
     Improvements:
-    - Strong validation
-    - Retry with exponential backoff
-    - Connection health check (ping)
+    - Strong validation (whole batch is rejected on a bad id)
+    - One RPUSH per ENQUEUE_CHUNK_SIZE jobs, all in one pipeline
+    - Dedup: appointments already queued or in flight are skipped
+    - Never blocks: if Redis is unreachable the jobs go to the local
+      spool and a background flusher delivers them later
     - Structured logging
+
+    Returns the number of jobs queued in Redis right now.
     """
 
-    if not isinstance(appointment_id, int) or appointment_id <= 0:
-        raise ValueError("Invalid appointment_id")
+    appointment_ids = list(dict.fromkeys(appointment_ids))
 
-    job = {
-        "appointment_id": appointment_id,
-        "timestamp": datetime.utcnow().isoformat(),
-    }
+    for appointment_id in appointment_ids:
+        _validate_appointment_id(appointment_id)
 
-    max_retries = 3
-    base_delay = 0.5  # seconds
+    if not appointment_ids:
+        return 0
 
-    for attempt in range(max_retries):
-        try:
-            # Ensure Redis is reachable
-            redis_client.ping()
+    started = time.perf_counter()
+
+    try:
+        queued = push_billing_jobs(appointment_ids)
+        JOBS_ENQUEUED.inc(queued, result="queued")
+        JOBS_ENQUEUED.inc(len(appointment_ids) - queued, result="duplicate")
+        return queued
+
+    except redis.exceptions.RedisError as e:
+        spool_billing_jobs(appointment_ids)
+        JOBS_ENQUEUED.inc(len(appointment_ids), result="spooled")
+        print(
+            f"📦 Redis unavailable, billing job(s) spooled | "
+            f"count={len(appointment_ids)} | error={str(e)}"
+        )
+        return 0
+
+    finally:
+        ENQUEUE_SECONDS.observe(time.perf_counter() - started)
+
+
+def push_billing_jobs(appointment_ids):
+    """
+    Queue already-validated appointment ids in Redis. Raises RedisError
+    on failure (callers decide whether to spool). Returns jobs queued.
+    """
+    timestamp = datetime.utcnow().isoformat()
+    jobs = [
+        json.dumps({"appointment_id": appointment_id, "timestamp": timestamp})
+        for appointment_id in appointment_ids
+    ]
+
+    pipe = redis_client.pipeline(transaction=False)
+
+    if BILLING_DEDUP_TTL > 0:
+        _push_jobs_dedup(pipe, appointment_ids, jobs)
+        queued = sum(pipe.execute())
+    else:
+        _push_jobs(pipe, jobs)
+        pipe.execute()
+        queued = len(jobs)
+
+    if len(appointment_ids) == 1:
+        print(
+            f"📥 Billing job {'queued' if queued else 'already queued'} | "
+            f"appointment_id={appointment_ids[0]}"
+        )
+    else:
+        print(
+            f"📥 Billing jobs queued | count={queued} | "
+            f"duplicates={len(appointment_ids) - queued}"
+        )
+
+    return queued
+
+
+# -------------------------------------------------
+# Reliable queue protocol (at-least-once delivery)
+#
+# list transport:
+#   billing_queue                     pending jobs
+#   billing_queue:processing:<worker> jobs reserved by one worker
+#   billing_queue:workers             ZSET worker -> last heartbeat
+# stream transport:
+#   billing_stream                    entries, consumer group billing_workers
+# both:
+#   billing_queue:dead                jobs that exhausted their retries
+#
+# reserve_billing_jobs returns (receipt, job_json) pairs; the receipt is
+# what ack/retry/dead-letter need (the raw job for lists, the entry id
+# for streams).
+# -------------------------------------------------
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def processing_list(worker_id):
+    return f"{BILLING_PROCESSING_PREFIX}{worker_id}"
+
+
+def heartbeat(worker_id):
+    # Streams track idle time per pending entry themselves
+    if BILLING_TRANSPORT == "stream":
+        return
+
+    redis_client.zadd(BILLING_WORKERS, {worker_id: time.time()})
+
+
+def retire_worker(worker_id):
+    """Clean shutdown: forget the worker once nothing is left in flight."""
+    if BILLING_TRANSPORT == "stream":
+        pending = redis_client.xpending_range(
+            BILLING_STREAM, BILLING_GROUP, "-", "+", 1, consumername=worker_id
+        )
+        if not pending:
+            redis_client.xgroup_delconsumer(BILLING_STREAM, BILLING_GROUP, worker_id)
+        return
+
+    if not redis_client.llen(processing_list(worker_id)):
+        redis_client.zrem(BILLING_WORKERS, worker_id)
+
+
+def reserve_billing_jobs(worker_id, count=1, timeout=2):
+    """
+    Reserve up to `count` jobs for this worker. Blocks for at most
+    `timeout` seconds, which must stay below the client's socket_timeout.
+    """
+    if BILLING_TRANSPORT == "stream":
+        return _reserve_stream_jobs(worker_id, count, timeout)
+
+    # Atomically move jobs into the worker's processing list. Blocks
+    # (BLMOVE) for the first job only; the rest are taken with one
+    # pipelined round of LMOVE so a short queue never stalls the worker.
+    processing = processing_list(worker_id)
+
+    first = redis_client.blmove(BILLING_QUEUE, processing, timeout, "LEFT", "RIGHT")
+
+    if first is None:
+        return []
+
+    jobs = [first]
+
+    if count > 1:
+        pipe = redis_client.pipeline(transaction=False)
+        for _ in range(count - 1):
+            pipe.lmove(BILLING_QUEUE, processing, "LEFT", "RIGHT")
+        jobs.extend(job for job in pipe.execute() if job is not None)
+
+    return [(job_json, job_json) for job_json in jobs]
+
+
+def ack_args(worker_id, receipt, job_json=None):
+    """(keys, args) for ACK_SCRIPT_SOURCE; shared with the async worker."""
+    if BILLING_TRANSPORT == "stream":
+        target = BILLING_STREAM
+    else:
+        target = processing_list(worker_id)
+
+    return (
+        [target] + _dedup_keys(job_json if job_json is not None else receipt),
+        [BILLING_TRANSPORT, receipt, BILLING_GROUP],
+    )
+
+
+def ack_billing_job(worker_id, receipt, job_json=None):
+    """
+    Job committed: drop it from the worker's in-flight set and, if that
+    removed it, release its dedup marker, in one round trip. Returns
+    False when the job was no longer reserved (reaped meanwhile).
+    """
+    keys, args = ack_args(worker_id, receipt, job_json)
+    return bool(_ACK_SCRIPT(keys=keys, args=args))
+
+
+def _next_attempt(job_json, reason):
+    """
+    Serialized job for the next attempt, or None when it has to be
+    dead-lettered (unparseable, or MAX_ATTEMPTS reached).
+    """
+    try:
+        job_data = json.loads(job_json)
+        if not isinstance(job_data, dict):
+            raise ValueError("job is not an object")
+    except ValueError:
+        return None
+
+    job_data["attempts"] = int(job_data.get("attempts", 0)) + 1
+    job_data["last_error"] = reason
+
+    if job_data["attempts"] >= MAX_ATTEMPTS:
+        return None
 
-            redis_client.rpush(BILLING_QUEUE, json.dumps(job))
+    return json.dumps(job_data)
 
-            print(f"📥 Billing job queued | appointment_id={appointment_id}")
-            return
 
-        except redis.exceptions.RedisError as e:
-            delay = base_delay * (2**attempt)
-            print(
-                f"❌ Redis push failed (attempt {attempt + 1}/{max_retries}) | "
-                f"error={str(e)} | retrying in {delay}s"
+def _schedule_retry(pipe, retry_json):
+    """
+    Park the next attempt in the scheduled ZSET with exponential backoff;
+    workers promote it back onto the queue once it is due.
+    """
+    pipe.zadd(BILLING_SCHEDULED, {retry_json: _retry_due(retry_json)})
+
+
+def _retry_due(retry_json):
+    attempts = json.loads(retry_json)["attempts"]
+    delay = min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), RETRY_MAX_DELAY)
+    return time.time() + delay
+
+
+def _dead_entry(job_json, reason, worker_id):
+    return json.dumps(
+        {
+            "job": job_json,
+            "reason": reason,
+            "worker_id": worker_id,
+            "failed_at": datetime.utcnow().isoformat(),
+        }
+    )
+
+
+def _move_job(processing, job_json, reason, worker_id, dead=False):
+    """
+    Move one entry out of a processing list, either into the scheduled
+    retries with attempts + 1 or onto the dead-letter list once
+    MAX_ATTEMPTS is reached. WATCH/MULTI keeps the LREM and the push atomic, so a crash
+    (or a racing reaper) can never lose or double-move the entry.
+    """
+    retry_json = None if dead else _next_attempt(job_json, reason)
+
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(processing)
+
+                if job_json not in pipe.lrange(processing, 0, -1):
+                    pipe.unwatch()
+                    return None
+
+                pipe.multi()
+                pipe.lrem(processing, 1, job_json)
+
+                if retry_json is None:
+                    pipe.rpush(
+                        BILLING_DEAD_QUEUE, _dead_entry(job_json, reason, worker_id)
+                    )
+                    clear_billing_dedup(job_json, pipe)
+                else:
+                    _schedule_retry(pipe, retry_json)
+
+                pipe.execute()
+                break
+
+            except redis.exceptions.WatchError:
+                continue
+
+    return BILLING_DEAD_QUEUE if retry_json is None else BILLING_SCHEDULED
+
+
+def _move_stream_entry(entry_id, job_json, reason, worker_id, dead=False):
+    """
+    Stream counterpart of _move_job: ack the entry and, only if this call
+    was the one to ack it, either schedule the next attempt or dead-letter
+    it. One script, so an entry already settled or reclaimed elsewhere
+    (XACK returns 0) is never retried or dead-lettered a second time.
+    """
+    retry_json = None if dead else _next_attempt(job_json, reason)
+
+    if retry_json is None:
+        keys = [BILLING_STREAM, BILLING_DEAD_QUEUE] + _dedup_keys(job_json)
+        args = [
+            BILLING_GROUP,
+            entry_id,
+            "dead",
+            _dead_entry(job_json, reason, worker_id),
+        ]
+    else:
+        keys = [BILLING_STREAM, BILLING_SCHEDULED]
+        args = [BILLING_GROUP, entry_id, "retry", retry_json, _retry_due(retry_json)]
+
+    if not _SETTLE_STREAM_SCRIPT(keys=keys, args=args):
+        # Someone else already settled or reclaimed it
+        return None
+
+    return BILLING_DEAD_QUEUE if retry_json is None else BILLING_SCHEDULED
+
+
+def _move_reserved(worker_id, receipt, job_json, reason, dead=False):
+    if BILLING_TRANSPORT == "stream":
+        return _move_stream_entry(receipt, job_json, reason, worker_id, dead=dead)
+
+    return _move_job(processing_list(worker_id), job_json, reason, worker_id, dead)
+
+
+def retry_billing_job(worker_id, receipt, job_json, reason):
+    """Transient failure: retry with backoff, or dead-letter after MAX_ATTEMPTS."""
+    target = _move_reserved(worker_id, receipt, job_json, reason)
+
+    if target == BILLING_DEAD_QUEUE:
+        print(f"☠️ Billing job dead-lettered | reason={reason} | job={job_json}")
+
+    return target
+
+
+def dead_letter_billing_job(worker_id, receipt, job_json, reason):
+    """Permanent failure (bad payload, missing appointment): no retries."""
+    target = _move_reserved(worker_id, receipt, job_json, reason, dead=True)
+
+    if target:
+        print(f"☠️ Billing job dead-lettered | reason={reason} | job={job_json}")
+
+    return target
+
+
+def promote_scheduled_jobs(limit=500):
+    """
+    Move retries whose backoff has expired back onto the queue/stream.
+    Atomic (Lua), so concurrent workers never promote a job twice.
+    """
+    target = BILLING_STREAM if BILLING_TRANSPORT == "stream" else BILLING_QUEUE
+
+    return _PROMOTE_SCRIPT(
+        keys=[BILLING_SCHEDULED, target],
+        args=[time.time(), limit, BILLING_TRANSPORT, BILLING_STREAM_MAXLEN],
+    )
+
+
+def reap_stalled_jobs(visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Hand the in-flight jobs of every worker whose heartbeat is older than
+    the visibility timeout back to the queue. Safe to run from any number
+    of workers at once. Returns the number of jobs moved.
+    """
+    if BILLING_TRANSPORT == "stream":
+        return _reap_stalled_stream_entries(visibility_timeout)
+
+    cutoff = time.time() - visibility_timeout
+    moved = 0
+
+    for worker_id in redis_client.zrangebyscore(BILLING_WORKERS, "-inf", cutoff):
+        processing = processing_list(worker_id)
+
+        for job_json in redis_client.lrange(processing, 0, -1):
+            if _move_job(processing, job_json, "visibility_timeout", worker_id):
+                moved += 1
+
+        # Only forget the worker if it did not come back meanwhile
+        if not redis_client.llen(processing):
+            redis_client.zrem(BILLING_WORKERS, worker_id)
+
+    if moved:
+        print(f"♻️ Reaper re-queued {moved} stalled billing job(s)")
+
+    return moved
+
+
+# -------------------------------------------------
+# Stream transport
+# -------------------------------------------------
+def ensure_billing_stream_group():
+    try:
+        redis_client.xgroup_create(BILLING_STREAM, BILLING_GROUP, id="0", mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _reserve_stream_jobs(worker_id, count, timeout):
+    try:
+        response = redis_client.xreadgroup(
+            BILLING_GROUP,
+            worker_id,
+            {BILLING_STREAM: ">"},
+            count=count,
+            block=int(timeout * 1000),
+        )
+    except redis.exceptions.ResponseError as e:
+        if "NOGROUP" not in str(e):
+            raise
+        ensure_billing_stream_group()
+        return []
+
+    reserved = []
+    for _, entries in response or []:
+        for entry_id, fields in entries:
+            reserved.append((entry_id, fields.get("job")))
+
+    return reserved
+
+
+def _reap_stalled_stream_entries(visibility_timeout):
+    """
+    XAUTOCLAIM entries that have been pending longer than the visibility
+    timeout and settle them like a failed attempt: re-added with
+    attempts + 1, or dead-lettered.
+    """
+    reaper_id = f"reaper:{default_worker_id()}"
+    start_id = "0-0"
+    moved = 0
+
+    while True:
+        try:
+            next_id, claimed, *_ = redis_client.xautoclaim(
+                BILLING_STREAM,
+                BILLING_GROUP,
+                reaper_id,
+                min_idle_time=int(visibility_timeout * 1000),
+                start_id=start_id,
+                count=100,
             )
-            sleep(delay)
+        except redis.exceptions.ResponseError as e:
+            if "NOGROUP" not in str(e):
+                raise
+            ensure_billing_stream_group()
+            return moved
+
+        for entry_id, fields in claimed:
+            if not fields:
+                # Entry was trimmed away (MAXLEN); nothing left to retry
+                redis_client.xack(BILLING_STREAM, BILLING_GROUP, entry_id)
+                continue
+
+            if _move_stream_entry(
+                entry_id, fields.get("job"), "visibility_timeout", reaper_id
+            ):
+                moved += 1
+
+        if next_id == "0-0":
+            break
+        start_id = next_id
+
+    # Claiming registers the reaper as a consumer; drop it again
+    redis_client.xgroup_delconsumer(BILLING_STREAM, BILLING_GROUP, reaper_id)
+
+    if moved:
+        print(f"♻️ Reaper re-queued {moved} stalled billing job(s)")
+
+    return moved
+
+
+def billing_backlog():
+    """
+    Queue depth for monitoring:
+    - pending:   jobs not yet handed to any worker
+    - in_flight: jobs reserved but not yet acked
+    - scheduled: retries waiting for their backoff to expire
+    - dead:      dead-lettered jobs
+    """
+    dead = redis_client.llen(BILLING_DEAD_QUEUE)
+    scheduled = redis_client.zcard(BILLING_SCHEDULED)
 
-    # If all retries fail
-    raise Exception(
-        f"Failed to enqueue billing job after {max_retries} attempts | appointment_id={appointment_id}"
+    if BILLING_TRANSPORT == "stream":
+        try:
+            groups = redis_client.xinfo_groups(BILLING_STREAM)
+        except redis.exceptions.ResponseError:
+            groups = []
+
+        group = next((g for g in groups if g.get("name") == BILLING_GROUP), None)
+
+        if group is None:
+            pending = redis_client.xlen(BILLING_STREAM)
+            in_flight = 0
+        else:
+            # "lag" needs Redis 7+; fall back to the raw stream length
+            pending = group.get("lag")
+            if pending is None:
+                pending = redis_client.xlen(BILLING_STREAM)
+            in_flight = group.get("pending", 0)
+
+        return {
+            "pending": pending,
+            "in_flight": in_flight,
+            "scheduled": scheduled,
+            "dead": dead,
+        }
+
+    workers = redis_client.zrange(BILLING_WORKERS, 0, -1)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.llen(BILLING_QUEUE)
+    for worker_id in workers:
+        pipe.llen(processing_list(worker_id))
+    pending, *in_flight = pipe.execute()
+
+    return {
+        "pending": pending,
+        "in_flight": sum(in_flight),
+        "scheduled": scheduled,
+        "dead": dead,
+    }
+
+
+# -------------------------------------------------
+# Dead-letter inspection / replay
+# -------------------------------------------------
+def list_dead_jobs(limit=50):
+    return [
+        json.loads(entry)
+        for entry in redis_client.lrange(BILLING_DEAD_QUEUE, 0, limit - 1)
+    ]
+
+
+def _replay_job(entry):
+    """Serialized job with a fresh attempt budget, or '' if unparseable."""
+    try:
+        job_data = json.loads(json.loads(entry)["job"])
+        if not isinstance(job_data, dict):
+            raise ValueError("job is not an object")
+    except (KeyError, TypeError, ValueError):
+        return ""
+
+    job_data["attempts"] = 0
+    job_data.pop("last_error", None)
+
+    return json.dumps(job_data)
+
+
+def replay_dead_jobs(count=None):
+    """
+    Push dead-lettered jobs back onto the queue with a fresh attempt
+    budget, through the enqueue dedup. `count=None` replays everything.
+    Each entry moves atomically (one script per entry, one pipeline for
+    all of them). Returns the number replayed.
+    """
+    if count is not None and count <= 0:
+        return 0
+
+    entries = redis_client.lrange(
+        BILLING_DEAD_QUEUE, 0, -1 if count is None else count - 1
     )
+    if not entries:
+        return 0
+
+    target = BILLING_STREAM if BILLING_TRANSPORT == "stream" else BILLING_QUEUE
+    pipe = redis_client.pipeline(transaction=False)
+
+    for entry in entries:
+        job_json = _replay_job(entry)
+        dedup_keys = _dedup_keys(job_json) if BILLING_DEDUP_TTL > 0 else []
+
+        _REPLAY_DEAD_SCRIPT(
+            keys=[BILLING_DEAD_QUEUE, target, BILLING_DEDUP_HITS] + dedup_keys,
+            args=[
+                entry,
+                job_json,
+                BILLING_TRANSPORT,
+                BILLING_STREAM_MAXLEN,
+                BILLING_DEDUP_TTL,
+            ],
+            client=pipe,
+        )
+
+    return sum(pipe.execute())
+
+
+def purge_dead_jobs():
+    return redis_client.delete(BILLING_DEAD_QUEUE)
@@ -1,12 +1,33 @@
 from backend.models.invoice import Invoice
+from backend.services.billing_metrics import INVOICE_IDEMPOTENT_HITS
 from backend.utils.db import get_db_session
 from datetime import datetime, timezone
+from sqlalchemy import insert, select
 from sqlalchemy.exc import IntegrityError
 
 DEFAULT_CONSULTATION_FEE = 500.0
 TAX_PERCENTAGE = 0.18
 
 
+def _build_invoice(appointment):
+    consultation_fee = (
+        getattr(appointment.doctor, "consultation_fee", None)
+        or DEFAULT_CONSULTATION_FEE
+    )
+    tax_amount = consultation_fee * TAX_PERCENTAGE
+    total_amount = consultation_fee + tax_amount
+
+    return Invoice(
+        appointment_id=appointment.id,
+        patient_id=appointment.patient_id,
+        doctor_id=appointment.doctor_id,
+        consultation_fee=consultation_fee,
+        tax_amount=tax_amount,
+        total_amount=total_amount,
+        status="pending",
+    )
+
+
 def create_invoice_for_appointment(session, appointment):
     """
     Creates invoice within existing DB transaction.
@@ -24,24 +45,10 @@ def create_invoice_for_appointment(session, appointment):
     # Fast idempotency check
     existing = session.query(Invoice).filter_by(appointment_id=appointment.id).first()
     if existing:
+        INVOICE_IDEMPOTENT_HITS.inc(source="existing")
         return existing
 
-    consultation_fee = (
-        getattr(appointment.doctor, "consultation_fee", None)
-        or DEFAULT_CONSULTATION_FEE
-    )
-    tax_amount = consultation_fee * TAX_PERCENTAGE
-    total_amount = consultation_fee + tax_amount
-
-    invoice = Invoice(
-        appointment_id=appointment.id,
-        patient_id=appointment.patient_id,
-        doctor_id=appointment.doctor_id,
-        consultation_fee=consultation_fee,
-        tax_amount=tax_amount,
-        total_amount=total_amount,
-        status="pending",
-    )
+    invoice = _build_invoice(appointment)
 
     try:
         # Use SAVEPOINT so we don't break outer transaction
@@ -61,9 +68,131 @@ def create_invoice_for_appointment(session, appointment):
         if not existing:
             raise
 
+        INVOICE_IDEMPOTENT_HITS.inc(source="integrity_error")
         return existing
 
 
+async def create_invoice_for_appointment_async(session, appointment):
+    """
+    AsyncSession variant of create_invoice_for_appointment.
+    Same contract: caller owns the transaction, appointment.doctor must
+    already be loaded (lazy loads are not allowed on an AsyncSession).
+    """
+
+    if not appointment:
+        raise ValueError("Invalid appointment")
+
+    if not appointment.doctor:
+        raise ValueError("Doctor data not loaded for appointment")
+
+    existing_query = select(Invoice).filter_by(appointment_id=appointment.id)
+
+    # Fast idempotency check
+    existing = (await session.execute(existing_query)).scalars().first()
+    if existing:
+        INVOICE_IDEMPOTENT_HITS.inc(source="existing")
+        return existing
+
+    invoice = _build_invoice(appointment)
+
+    try:
+        # Use SAVEPOINT so we don't break outer transaction
+        async with session.begin_nested():
+            session.add(invoice)
+            await session.flush()
+        return invoice
+
+    except IntegrityError:
+        # Another transaction already created invoice
+        session.expire_all()
+
+        existing = (await session.execute(existing_query)).scalars().first()
+
+        if not existing:
+            raise
+
+        INVOICE_IDEMPOTENT_HITS.inc(source="integrity_error")
+        return existing
+
+
+def create_invoices_for_appointments(session, appointments):
+    """
+    Batch variant of create_invoice_for_appointment.
+    One idempotency query for the whole batch and one multi-row INSERT
+    for the missing invoices. No commit here (transaction handled by caller).
+    Returns {"created": [appointment_id, ...], "existing": [appointment_id, ...]}.
+    """
+
+    if not appointments:
+        return {"created": [], "existing": []}
+
+    for appointment in appointments:
+        if not appointment.doctor:
+            raise ValueError(f"Doctor data not loaded for appointment {appointment.id}")
+
+    appointment_ids = [a.id for a in appointments]
+
+    existing_ids = {
+        row.appointment_id
+        for row in session.query(Invoice.appointment_id).filter(
+            Invoice.appointment_id.in_(appointment_ids)
+        )
+    }
+
+    missing = [a for a in appointments if a.id not in existing_ids]
+
+    if existing_ids:
+        INVOICE_IDEMPOTENT_HITS.inc(len(existing_ids), source="existing")
+
+    if not missing:
+        return {"created": [], "existing": appointment_ids}
+
+    rows = []
+    for appointment in missing:
+        invoice = _build_invoice(appointment)
+        rows.append(
+            {
+                "appointment_id": invoice.appointment_id,
+                "patient_id": invoice.patient_id,
+                "doctor_id": invoice.doctor_id,
+                "consultation_fee": invoice.consultation_fee,
+                "tax_amount": invoice.tax_amount,
+                "total_amount": invoice.total_amount,
+                "status": invoice.status,
+                "created_at": datetime.utcnow(),
+            }
+        )
+
+    try:
+        # Single executemany INSERT inside a SAVEPOINT
+        with session.begin_nested():
+            session.execute(insert(Invoice), rows)
+
+        return {
+            "created": [a.id for a in missing],
+            "existing": [a.id for a in appointments if a.id in existing_ids],
+        }
+
+    except IntegrityError:
+        # A concurrent worker invoiced part of the batch; settle row by row
+        session.expire_all()
+
+        existing_ids = {
+            row.appointment_id
+            for row in session.query(Invoice.appointment_id).filter(
+                Invoice.appointment_id.in_(appointment_ids)
+            )
+        }
+
+        for appointment in appointments:
+            create_invoice_for_appointment(session, appointment)
+
+        return {
+            "created": [a.id for a in appointments if a.id not in existing_ids],
+            "existing": [a.id for a in appointments if a.id in existing_ids],
+        }
+
+
 def pay_invoice(invoice_id):
     session = get_db_session()
     try:
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# -------------------------------------------------
+# Local durable spool for billing jobs that could not reach Redis.
+#
+# enqueue_billing_jobs writes here instead of sleeping in the request
+# thread; a background flusher replays the spool into Redis once it is
+# reachable again. SQLite keeps entries across restarts and serializes
+# concurrent flushers from several app processes.
+# -------------------------------------------------
+BASE_DIR = Path(__file__).resolve().parent.parent
+SPOOL_PATH = os.getenv("BILLING_SPOOL_PATH", str(BASE_DIR / "var" / "billing_spool.db"))
+FLUSH_INTERVAL = float(os.getenv("BILLING_SPOOL_FLUSH_INTERVAL", 2))  # seconds
+MAX_FLUSH_INTERVAL = 60  # seconds, backoff cap while Redis stays down
+FLUSH_BATCH = 500  # spool rows per flush transaction
+
+_flusher_lock = threading.Lock()
+_flusher_thread = None
+_wakeup = threading.Event()
+
+
+def _connect():
+    Path(SPOOL_PATH).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SPOOL_PATH, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS billing_spool ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " appointment_ids TEXT NOT NULL,"
+        " created_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def spool_billing_jobs(appointment_ids):
+    """Durably record jobs for later delivery and wake the flusher."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "INSERT INTO billing_spool (appointment_ids, created_at) VALUES (?, ?)",
+            (json.dumps(list(appointment_ids)), time.time()),
+        )
+    finally:
+        conn.close()
+
+    start_spool_flusher()
+    _wakeup.set()
+
+
+def spooled_count():
+    conn = _connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM billing_spool").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def flush_spool(push):
+    """
+    Replay spooled rows oldest-first through `push(appointment_ids)`.
+    Rows are deleted in the same SQLite write transaction that read them,
+    so concurrent flushers never replay a row twice. Stops at the first
+    push error (Redis still down) and leaves the rest spooled.
+    Returns the number of rows flushed.
+    """
+    conn = _connect()
+    flushed = 0
+
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, appointment_ids FROM billing_spool ORDER BY id LIMIT ?",
+                (FLUSH_BATCH,),
+            ).fetchall()
+
+            if not rows:
+                conn.execute("COMMIT")
+                return flushed
+
+            done = []
+            try:
+                for row_id, appointment_ids in rows:
+                    push(json.loads(appointment_ids))
+                    done.append(row_id)
+            finally:
+                conn.executemany(
+                    "DELETE FROM billing_spool WHERE id = ?",
+                    [(row_id,) for row_id in done],
+                )
+                conn.execute("COMMIT")
+                flushed += len(done)
+
+    finally:
+        conn.close()
+
+
+def _flush_forever():
+    # Imported here: billing_queue imports this module
+    from backend.services.billing_queue import push_billing_jobs
+
+    delay = FLUSH_INTERVAL
+
+    while True:
+        _wakeup.wait(delay)
+        _wakeup.clear()
+
+        try:
+            flushed = flush_spool(push_billing_jobs)
+            if flushed:
+                print(f"📤 Billing spool flushed | rows={flushed}")
+            delay = FLUSH_INTERVAL
+
+        except Exception as e:
+            delay = min(delay * 2, MAX_FLUSH_INTERVAL)
+            print(f"❌ Billing spool flush failed | error={str(e)} | next in {delay}s")
+
+
+def start_spool_flusher():
+    """Start the background flusher once per process (idempotent)."""
+    global _flusher_thread
+
+    with _flusher_lock:
+        if _flusher_thread is not None and _flusher_thread.is_alive():
+            return
+
+        _flusher_thread = threading.Thread(
+            target=_flush_forever, name="billing-spool-flusher", daemon=True
+        )
+        _flusher_thread.start()
@@ -58,6 +58,37 @@ def create_doctor_service(user_id, specialization, department_id):
         session.close()
 
 
+# ---------------------------------------
+# Doctor directory: one joined, column-only SELECT
+# (doctor + user name + department name), no ORM entities and no lazy
+# loads, so a listing of N doctors costs one round trip.
+# ---------------------------------------
+def _doctor_directory_query(session):
+    return (
+        session.query(
+            Doctor.id,
+            User.name,
+            Doctor.specialization,
+            Doctor.department_id,
+            Department.name.label("department_name"),
+            Doctor.consultation_fee,
+        )
+        .outerjoin(User, User.id == Doctor.user_id)
+        .outerjoin(Department, Department.id == Doctor.department_id)
+    )
+
+
+def _doctor_row(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "specialization": row.specialization,
+        "department_id": row.department_id,
+        "department_name": row.department_name,
+        "consultation_fee": row.consultation_fee,
+    }
+
+
 # ---------------------------------------
 # Get All Doctors
 # ---------------------------------------
@@ -65,17 +96,9 @@ def get_all_doctors_service():
     session = get_db_session()
 
     try:
-        doctors = session.query(Doctor).all()
-
-        return [
-            {
-                "id": d.id,
-                "name": d.user.name if d.user else None,
-                "specialization": d.specialization,
-                "department_id": d.department_id,
-            }
-            for d in doctors
-        ]
+        doctors = _doctor_directory_query(session).order_by(Doctor.id).all()
+
+        return [_doctor_row(d) for d in doctors]
 
     finally:
         session.close()
@@ -89,17 +112,13 @@ def get_doctors_by_department_service(department_id):
 
     try:
         doctors = (
-            session.query(Doctor).filter(Doctor.department_id == department_id).all()
+            _doctor_directory_query(session)
+            .filter(Doctor.department_id == department_id)
+            .order_by(Doctor.id)
+            .all()
         )
 
-        return [
-            {
-                "id": d.id,
-                "name": d.user.name if d.user else None,
-                "specialization": d.specialization,
-            }
-            for d in doctors
-        ]
+        return [_doctor_row(d) for d in doctors]
 
     finally:
         session.close()
@@ -112,17 +131,12 @@ def get_doctor_by_id_service(doctor_id):
     session = get_db_session()
 
     try:
-        doctor = session.query(Doctor).filter(Doctor.id == doctor_id).first()
+        doctor = _doctor_directory_query(session).filter(Doctor.id == doctor_id).first()
 
         if not doctor:
             raise ValueError("Doctor not found")
 
-        return {
-            "id": doctor.id,
-            "name": doctor.user.name if doctor.user else None,
-            "specialization": doctor.specialization,
-            "department_id": doctor.department_id,
-        }
+        return _doctor_row(doctor)
 
     finally:
         session.close()
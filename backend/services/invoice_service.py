@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from backend.models.invoice import Invoice
+from backend.utils.db import get_db_session
+from backend.utils.export import check_export_format, stream_query
+
+INVOICE_PAGE_DEFAULT = 50
+INVOICE_PAGE_MAX = 200
+# Filtered totals are counted up to this many rows, then reported as "N+"
+INVOICE_COUNT_CAP = 10000
+
+INVOICE_COLUMNS = (
+    Invoice.id,
+    Invoice.appointment_id,
+    Invoice.patient_id,
+    Invoice.doctor_id,
+    Invoice.total_amount,
+    Invoice.status,
+    Invoice.created_at,
+    Invoice.paid_at,
+)
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name} (YYYY-MM-DD required)")
+
+
+def _invoice_filters(
+    status=None, doctor_id=None, patient_id=None, date_from=None, date_to=None
+):
+    filters = []
+
+    if status:
+        filters.append(Invoice.status == status)
+    if doctor_id is not None:
+        filters.append(Invoice.doctor_id == int(doctor_id))
+    if patient_id is not None:
+        filters.append(Invoice.patient_id == int(patient_id))
+    if date_from:
+        filters.append(Invoice.created_at >= _parse_date(date_from, "date_from"))
+    if date_to:
+        # Inclusive: everything created on date_to
+        filters.append(
+            Invoice.created_at < _parse_date(date_to, "date_to") + timedelta(days=1)
+        )
+
+    return filters
+
+
+def _estimate_total(session, filters):
+    """
+    (value, exact). Unfiltered on MySQL: the table statistics, no scan.
+    Otherwise a COUNT over at most INVOICE_COUNT_CAP index entries.
+    """
+    if not filters and session.bind.dialect.name == "mysql":
+        rows = session.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'invoices'"
+            )
+        ).scalar()
+        return int(rows or 0), False
+
+    capped = select(Invoice.id).where(*filters).limit(INVOICE_COUNT_CAP + 1).subquery()
+    count = session.execute(select(func.count()).select_from(capped)).scalar()
+
+    if count > INVOICE_COUNT_CAP:
+        return INVOICE_COUNT_CAP, False
+    return count, True
+
+
+# -----------------------------------------
+# Admin invoice listing (keyset pagination)
+#
+# Newest first on (created_at, id), column-only rows, one page per
+# request. The cursor is "created_at,id" of the last row, so page N is
+# one index range read, never an OFFSET scan. Each filter has a
+# (filter, created_at) index to walk (see Invoice.__table_args__). The
+# total is only estimated, and only for the first page.
+# -----------------------------------------
+def list_invoices_service(
+    limit=INVOICE_PAGE_DEFAULT,
+    cursor=None,
+    status=None,
+    doctor_id=None,
+    patient_id=None,
+    date_from=None,
+    date_to=None,
+):
+    limit = int(limit)
+    if limit <= 0 or limit > INVOICE_PAGE_MAX:
+        raise ValueError(f"limit must be between 1 and {INVOICE_PAGE_MAX}")
+
+    filters = _invoice_filters(status, doctor_id, patient_id, date_from, date_to)
+
+    after = None
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = cursor.rsplit(",", 1)
+            after = (datetime.fromisoformat(cursor_created_at), int(cursor_id))
+        except ValueError:
+            raise ValueError("Invalid cursor")
+
+    session = get_db_session()
+
+    try:
+        query = select(*INVOICE_COLUMNS).where(*filters)
+
+        if after:
+            after_created_at, after_id = after
+            query = query.where(
+                Invoice.created_at <= after_created_at,
+                or_(
+                    Invoice.created_at < after_created_at,
+                    and_(
+                        Invoice.created_at == after_created_at,
+                        Invoice.id < after_id,
+                    ),
+                ),
+            )
+
+        rows = session.execute(
+            query.order_by(Invoice.created_at.desc(), Invoice.id.desc()).limit(
+                limit + 1
+            )
+        ).all()
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = f"{last.created_at.isoformat()},{last.id}"
+
+        result = {
+            "count": len(page),
+            "invoices": [
+                {
+                    "invoice_id": row.id,
+                    "appointment_id": row.appointment_id,
+                    "patient_id": row.patient_id,
+                    "doctor_id": row.doctor_id,
+                    "total_amount": row.total_amount,
+                    "status": row.status,
+                    "created_at": row.created_at,
+                    "paid_at": row.paid_at,
+                }
+                for row in page
+            ],
+            "next_cursor": next_cursor,
+        }
+
+        if not cursor:
+            total, exact = _estimate_total(session, filters)
+            result["total_estimate"] = total
+            result["total_is_exact"] = exact
+
+        return result
+
+    except SQLAlchemyError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# -----------------------------------------
+# Invoice export (streamed NDJSON / CSV, oldest first)
+# -----------------------------------------
+INVOICE_EXPORT_COLUMNS = (
+    Invoice.id,
+    Invoice.appointment_id,
+    Invoice.patient_id,
+    Invoice.doctor_id,
+    Invoice.consultation_fee,
+    Invoice.tax_amount,
+    Invoice.total_amount,
+    Invoice.status,
+    Invoice.created_at,
+    Invoice.paid_at,
+    Invoice.refunded_at,
+)
+
+
+def export_invoices_service(
+    fmt, status=None, doctor_id=None, patient_id=None, date_from=None, date_to=None
+):
+    """Validate now, return a generator of text chunks to stream."""
+    check_export_format(fmt)
+    filters = _invoice_filters(status, doctor_id, patient_id, date_from, date_to)
+
+    return stream_query(
+        select(*INVOICE_EXPORT_COLUMNS).where(*filters).order_by(Invoice.id),
+        [column.key for column in INVOICE_EXPORT_COLUMNS],
+        fmt,
+    )
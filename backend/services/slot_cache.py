@@ -0,0 +1,176 @@
+import json
+import os
+import redis
+from backend.utils.metrics import Counter
+from backend.utils.redis_client import redis_client
+
+# -------------------------------------------------
+# Available-slots cache, one entry per (doctor_id, date), and the monthly
+# calendar built from the same slots, one entry per (doctor_id, month)
+#
+#   slot_cache:{doctor_id}:{date}               JSON list, SLOT_CACHE_TTL
+#   slot_cache:gen:{doctor_id}:{date}           generation
+#   slot_cache:calendar:{doctor_id}:{month}     JSON, CALENDAR_CACHE_TTL
+#   slot_cache:calendar:gen:{doctor_id}:{month} generation
+#
+# Writers (booking, cancellation, slot generation) bump the generation
+# and drop the entry after commit. A reader only stores what it loaded if
+# the generation is still the one it saw before querying MySQL, so a read
+# that raced a booking can never re-populate a stale "available" slot.
+# Redis errors fall through to MySQL.
+# -------------------------------------------------
+SLOT_CACHE_PREFIX = "slot_cache:"
+SLOT_CACHE_TTL = int(os.getenv("SLOT_CACHE_TTL", 30))  # seconds
+CALENDAR_CACHE_TTL = int(os.getenv("CALENDAR_CACHE_TTL", 300))  # seconds
+GENERATION_TTL = 86400  # seconds; only has to outlive one cache fill
+
+SLOT_CACHE_REQUESTS = Counter(
+    "slot_cache_requests_total",
+    "Available-slots cache lookups by result",
+    ["result"],  # hit | miss | error
+)
+
+CALENDAR_CACHE_REQUESTS = Counter(
+    "calendar_cache_requests_total",
+    "Doctor calendar cache lookups by result",
+    ["result"],  # hit | miss | error
+)
+
+_FILL_SCRIPT = redis_client.register_script(
+    """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3]) and 1 or 0
+end
+return 0
+"""
+)
+
+
+def _cache_key(doctor_id, date):
+    return f"{SLOT_CACHE_PREFIX}{doctor_id}:{date}"
+
+
+def _generation_key(doctor_id, date):
+    return f"{SLOT_CACHE_PREFIX}gen:{doctor_id}:{date}"
+
+
+def _calendar_key(doctor_id, month):
+    return f"{SLOT_CACHE_PREFIX}calendar:{doctor_id}:{month}"
+
+
+def _calendar_generation_key(doctor_id, month):
+    return f"{SLOT_CACHE_PREFIX}calendar:gen:{doctor_id}:{month}"
+
+
+def get_cached_available_slots(doctor_id, date, load):
+    """Return the cached slot list, or `load()` it and cache the result."""
+    return _get_or_fill(
+        _cache_key(doctor_id, date),
+        _generation_key(doctor_id, date),
+        SLOT_CACHE_TTL,
+        SLOT_CACHE_REQUESTS,
+        load,
+    )
+
+
+def get_cached_calendar(doctor_id, month, load):
+    """Same as above for a doctor's per-day counts of one month (YYYY-MM)."""
+    return _get_or_fill(
+        _calendar_key(doctor_id, month),
+        _calendar_generation_key(doctor_id, month),
+        CALENDAR_CACHE_TTL,
+        CALENDAR_CACHE_REQUESTS,
+        load,
+    )
+
+
+def _get_or_fill(key, generation_key, ttl, requests, load):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.get(generation_key)
+        cached, generation = pipe.execute()
+    except redis.exceptions.RedisError as e:
+        requests.inc(result="error")
+        print(f"⚠️ Slot cache unavailable | error={str(e)}")
+        return load()
+
+    if cached is not None:
+        requests.inc(result="hit")
+        return json.loads(cached)
+
+    requests.inc(result="miss")
+    value = load()
+
+    try:
+        _FILL_SCRIPT(
+            keys=[key, generation_key],
+            args=[generation or "0", json.dumps(value), ttl],
+        )
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Slot cache fill failed | error={str(e)}")
+
+    return value
+
+
+def invalidate_available_slots(doctor_id, dates):
+    """
+    Drop cached entries for `dates`, and the calendars of their months,
+    after a committed slot write.
+    """
+    keys = [(_cache_key, _generation_key, date) for date in dates]
+    keys += [
+        (_calendar_key, _calendar_generation_key, month)
+        for month in sorted({str(date)[:7] for date in dates})
+    ]
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for cache_key, generation_key, suffix in keys:
+            pipe.incr(generation_key(doctor_id, suffix))
+            pipe.expire(generation_key(doctor_id, suffix), GENERATION_TTL)
+            pipe.delete(cache_key(doctor_id, suffix))
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        # Entries expire within SLOT_CACHE_TTL; booking itself is still
+        # protected by the slot hold and the conditional UPDATE.
+        print(f"⚠️ Slot cache invalidation failed | error={str(e)}")
+
+
+# -------------------------------------------------
+# Next-available search cache, one entry per (department, from, cursor,
+# limit) page. Not invalidated: pages live NEXT_AVAILABLE_CACHE_TTL
+# seconds and a slot booked meanwhile is answered 409 by booking itself.
+# -------------------------------------------------
+NEXT_AVAILABLE_CACHE_TTL = int(os.getenv("NEXT_AVAILABLE_CACHE_TTL", 5))  # seconds
+
+NEXT_AVAILABLE_CACHE_REQUESTS = Counter(
+    "next_available_cache_requests_total",
+    "Next-available search cache lookups by result",
+    ["result"],  # hit | miss | error
+)
+
+
+def get_cached_next_available(department_id, from_date, cursor, limit, load):
+    key = f"{SLOT_CACHE_PREFIX}next:{department_id}:{from_date}:{cursor}:{limit}"
+
+    try:
+        cached = redis_client.get(key)
+    except redis.exceptions.RedisError as e:
+        NEXT_AVAILABLE_CACHE_REQUESTS.inc(result="error")
+        print(f"⚠️ Next-available cache unavailable | error={str(e)}")
+        return load()
+
+    if cached is not None:
+        NEXT_AVAILABLE_CACHE_REQUESTS.inc(result="hit")
+        return json.loads(cached)
+
+    NEXT_AVAILABLE_CACHE_REQUESTS.inc(result="miss")
+    page = load()
+
+    try:
+        redis_client.set(key, json.dumps(page), ex=NEXT_AVAILABLE_CACHE_TTL)
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Next-available cache fill failed | error={str(e)}")
+
+    return page
@@ -0,0 +1,85 @@
+import os
+import uuid
+import redis
+from backend.utils.redis_client import redis_client
+
+# -------------------------------------------------
+# Short-lived slot holds in Redis, taken before the booking transaction.
+#
+#   slot_hold:{slot_id} = <token>   SET NX PX, held while the DB write runs
+#   slot_hold:{slot_id} = "booked"  after commit, so repeat clicks on a
+#                                   booked slot never reach MySQL
+#
+# Only one request per slot gets past the hold, so MySQL sees one booking
+# transaction per slot instead of one per click. Holds are an optimisation
+# only: the conditional UPDATE in book_appointment_service stays the
+# source of truth, and callers carry on without a hold if Redis is down.
+# -------------------------------------------------
+SLOT_HOLD_PREFIX = "slot_hold:"
+SLOT_HOLD_TTL_MS = int(os.getenv("SLOT_HOLD_TTL_MS", 5000))
+SLOT_BOOKED_TTL_MS = int(os.getenv("SLOT_BOOKED_TTL_MS", 60000))
+BOOKED_MARKER = "booked"
+
+# Compare-and-delete / compare-and-set: never touch a hold we do not own
+# (ours may have expired and been taken by another request).
+_RELEASE_SCRIPT = redis_client.register_script(
+    """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+)
+
+_CONFIRM_SCRIPT = redis_client.register_script(
+    """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3]) and 1 or 0
+end
+return 0
+"""
+)
+
+
+def _hold_key(slot_id):
+    return f"{SLOT_HOLD_PREFIX}{slot_id}"
+
+
+def acquire_slot_hold(slot_id):
+    """
+    Returns a hold token, or None if another request holds the slot or it
+    was just booked. Raises RedisError when Redis is unreachable.
+    """
+    token = uuid.uuid4().hex
+
+    if redis_client.set(_hold_key(slot_id), token, nx=True, px=SLOT_HOLD_TTL_MS):
+        return token
+
+    return None
+
+
+def release_slot_hold(slot_id, token):
+    """Drop our hold after a failed booking (best effort)."""
+    try:
+        _RELEASE_SCRIPT(keys=[_hold_key(slot_id)], args=[token])
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Slot hold release failed | slot_id={slot_id} | error={str(e)}")
+
+
+def confirm_slot_hold(slot_id, token):
+    """Turn our hold into a booked marker after commit (best effort)."""
+    try:
+        _CONFIRM_SCRIPT(
+            keys=[_hold_key(slot_id)],
+            args=[token, BOOKED_MARKER, SLOT_BOOKED_TTL_MS],
+        )
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Slot hold confirm failed | slot_id={slot_id} | error={str(e)}")
+
+
+def clear_slot_hold(slot_id):
+    """Forget any hold/booked marker once the slot is free again."""
+    try:
+        redis_client.delete(_hold_key(slot_id))
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Slot hold clear failed | slot_id={slot_id} | error={str(e)}")
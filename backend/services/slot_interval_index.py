@@ -0,0 +1,84 @@
+from bisect import bisect_left
+from collections import defaultdict
+from backend.models.availability_slot import AvailabilitySlot
+
+# -------------------------------------------------
+# Per-(doctor, date) interval index for slot overlap checks.
+#
+# Busy time is kept as sorted, disjoint [start, end) intervals (existing
+# slots that overlap each other are merged on load). Because they are
+# disjoint, their end times are sorted too, so "does (start, end) overlap
+# anything" is one bisect: only the last interval starting before `end`
+# can reach past `start`.
+#
+# Built from one query per request; every slot writer checks candidates
+# in memory instead of issuing an overlap probe per slot.
+# -------------------------------------------------
+
+
+class SlotIntervalIndex:
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+
+        for start, end in sorted(intervals):
+            if self._ends and start < self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start, end):
+        i = bisect_left(self._starts, end) - 1
+        return i >= 0 and self._ends[i] > start
+
+    def add(self, start, end):
+        """Record a slot that was checked with `overlaps` first."""
+        i = bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+
+    def claim(self, candidates):
+        """
+        Split candidates into (free, conflicting). Free ones are added to
+        the index, so later candidates (e.g. from an overlapping schedule
+        row) are checked against them too.
+        """
+        free, conflicting = [], []
+
+        for start, end in candidates:
+            if self.overlaps(start, end):
+                conflicting.append((start, end))
+            else:
+                self.add(start, end)
+                free.append((start, end))
+
+        return free, conflicting
+
+
+def load_slot_indexes(session, doctor_ids, first_day, last_day=None):
+    """
+    One range query for every slot of `doctor_ids` between the two dates;
+    returns {(doctor_id, date): SlotIntervalIndex}, empty for missing keys.
+    """
+    intervals = defaultdict(list)
+
+    for row in session.query(
+        AvailabilitySlot.doctor_id,
+        AvailabilitySlot.date,
+        AvailabilitySlot.start_time,
+        AvailabilitySlot.end_time,
+    ).filter(
+        AvailabilitySlot.doctor_id.in_(list(doctor_ids)),
+        AvailabilitySlot.date.between(first_day, last_day or first_day),
+    ):
+        intervals[(row.doctor_id, row.date)].append((row.start_time, row.end_time))
+
+    indexes = defaultdict(SlotIntervalIndex)
+    for key, rows in intervals.items():
+        indexes[key] = SlotIntervalIndex(rows)
+
+    return indexes
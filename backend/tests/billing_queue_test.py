@@ -0,0 +1,245 @@
+"""
+Billing queue settlement checks.
+
+Every case runs against fakeredis on the stream transport and checks that
+an entry settles exactly once: after it is acked, a late retry or
+dead-letter (from the same worker or the reaper) must be a no-op, and a
+late ack of a reaped job must leave the retry's dedup marker alone.
+Replaying the dead list requeues good jobs once, through the dedup, and
+keeps malformed entries parked. The
+completion case also uses a fresh SQLite file: completing an appointment
+twice must queue one billing job, even after the first was acked.
+
+    python -m backend.tests.billing_queue_test
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import date
+
+
+def check(name, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {name}{f' | {detail}' if detail else ''}")
+    return ok
+
+
+def reset(queue):
+    from backend.utils.redis_client import redis_client
+
+    redis_client.flushall()
+    queue.ensure_billing_stream_group()
+
+
+def reserve_one(queue, appointment_id):
+    queue.push_billing_jobs([appointment_id])
+    (receipt, job_json), *_ = queue.reserve_billing_jobs("w1", count=1, timeout=0)
+    return receipt, job_json
+
+
+def ack_then_retry(queue):
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    receipt, job_json = reserve_one(queue, 1)
+    queue.ack_billing_job("w1", receipt, job_json)
+
+    target = queue.retry_billing_job("w1", receipt, job_json, "boom")
+    scheduled = redis_client.zcard(queue.BILLING_SCHEDULED)
+
+    return check(
+        "ack then retry schedules nothing",
+        target is None and scheduled == 0,
+        f"target={target} scheduled={scheduled}",
+    )
+
+
+def ack_then_dead(queue):
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    receipt, job_json = reserve_one(queue, 2)
+    queue.ack_billing_job("w1", receipt, job_json)
+
+    # The next job for the appointment was queued meanwhile; its marker
+    # must survive the late dead-letter of the settled one.
+    queue.push_billing_jobs([2])
+
+    target = queue.dead_letter_billing_job("w1", receipt, job_json, "boom")
+    dead = redis_client.llen(queue.BILLING_DEAD_QUEUE)
+    marker = redis_client.exists(queue._dedup_key(2))
+
+    return check(
+        "ack then dead-letter is a no-op",
+        target is None and dead == 0 and marker == 1,
+        f"target={target} dead={dead} dedup_marker={marker}",
+    )
+
+
+def retry_then_dead(queue):
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    receipt, job_json = reserve_one(queue, 3)
+
+    first = queue.retry_billing_job("w1", receipt, job_json, "boom")
+    second = queue.dead_letter_billing_job("w1", receipt, job_json, "boom")
+    scheduled = redis_client.zcard(queue.BILLING_SCHEDULED)
+    dead = redis_client.llen(queue.BILLING_DEAD_QUEUE)
+
+    return check(
+        "unacked entry settles once",
+        first == queue.BILLING_SCHEDULED
+        and second is None
+        and scheduled == 1
+        and dead == 0,
+        f"first={first} second={second} scheduled={scheduled} dead={dead}",
+    )
+
+
+def reaped_then_ack(queue):
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    receipt, job_json = reserve_one(queue, 4)
+    queue.reap_stalled_jobs(visibility_timeout=0)
+
+    acked = queue.ack_billing_job("w1", receipt, job_json)
+    marker = redis_client.exists(queue._dedup_key(4))
+
+    return check(
+        "late ack of a reaped job keeps the dedup marker",
+        not acked and marker == 1,
+        f"acked={acked} dedup_marker={marker}",
+    )
+
+
+def reaped_then_ack_async(queue):
+    import fakeredis
+    from backend.utils.redis_client import redis_pool
+
+    try:
+        from backend.workers.billing_worker_async import ack_billing_job_async
+    except ImportError as e:
+        # The async worker needs its MySQL driver (aiomysql/asyncmy)
+        print(f"⏭️ late async ack of a reaped job skipped | {e}")
+        return True
+
+    reset(queue)
+    receipt, job_json = reserve_one(queue, 5)
+    queue.reap_stalled_jobs(visibility_timeout=0)
+
+    async def late_ack():
+        client = fakeredis.aioredis.FakeRedis(
+            server=redis_pool.connection_kwargs["server"], decode_responses=True
+        )
+        acked = await ack_billing_job_async(client, "w1", receipt, job_json)
+        return acked, await client.exists(queue._dedup_key(5))
+
+    acked, marker = asyncio.run(late_ack())
+
+    return check(
+        "late async ack of a reaped job keeps the dedup marker",
+        not acked and marker == 1,
+        f"acked={acked} dedup_marker={marker}",
+    )
+
+
+def replay_dead(queue):
+    import json
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    for appointment_id in (6, 7):
+        receipt, job_json = reserve_one(queue, appointment_id)
+        queue.dead_letter_billing_job("w1", receipt, job_json, "boom")
+
+    malformed = ["not json", json.dumps(["no", "job"]), json.dumps({"reason": "x"})]
+    redis_client.rpush(queue.BILLING_DEAD_QUEUE, *malformed)
+
+    # Appointment 7 was queued again meanwhile: its replay is a dedup hit
+    queue.push_billing_jobs([7])
+    queued_before = redis_client.xlen(queue.BILLING_STREAM)
+
+    replayed = queue.replay_dead_jobs()
+    queued = redis_client.xlen(queue.BILLING_STREAM) - queued_before
+    dead = redis_client.lrange(queue.BILLING_DEAD_QUEUE, 0, -1)
+    marker = redis_client.exists(queue._dedup_key(6))
+
+    return check(
+        "replay requeues once and keeps malformed entries",
+        replayed == 1
+        and queued == 1
+        and marker == 1
+        and sorted(dead) == sorted(malformed),
+        f"replayed={replayed} queued={queued} dedup_marker={marker} dead={len(dead)}",
+    )
+
+
+def complete_twice(queue):
+    from sqlalchemy import insert
+    from backend.models.appointment import Appointment
+    from backend.services.appointment_service import complete_appointment_service
+    from backend.tests.race_test import seed
+    from backend.utils.db import engine
+    from backend.utils.redis_client import redis_client
+
+    reset(queue)
+    seed(engine, slots=1)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Appointment),
+            [
+                {
+                    "id": 1,
+                    "patient_id": 2,
+                    "doctor_id": 1,
+                    "slot_id": 1,
+                    "appointment_date": date(2030, 1, 1),
+                    "status": "booked",
+                }
+            ],
+        )
+
+    complete_appointment_service(1)
+
+    # Let the worker settle the first job; this releases the dedup marker
+    (receipt, job_json), *_ = queue.reserve_billing_jobs("w1", count=1, timeout=0)
+    queue.ack_billing_job("w1", receipt, job_json)
+
+    result = complete_appointment_service(1)
+    queued = redis_client.xlen(queue.BILLING_STREAM)
+
+    return check(
+        "repeat completion queues no second job",
+        queued == 1 and result["status"] == "completed",
+        f"queued={queued} status={result['status']}",
+    )
+
+
+def main():
+    os.environ["BILLING_TRANSPORT"] = "stream"
+    workdir = tempfile.mkdtemp(prefix="billing_queue_test_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'billing.db')}"
+
+    from backend.benchmarks.billing_worker_bench import use_fakeredis
+
+    use_fakeredis()
+
+    from backend.services import billing_queue
+
+    results = [
+        ack_then_retry(billing_queue),
+        ack_then_dead(billing_queue),
+        retry_then_dead(billing_queue),
+        reaped_then_ack(billing_queue),
+        reaped_then_ack_async(billing_queue),
+        replay_dead(billing_queue),
+        complete_twice(billing_queue),
+    ]
+
+    raise SystemExit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
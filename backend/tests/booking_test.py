@@ -0,0 +1,156 @@
+"""
+Rebooking checks.
+
+A cancelled appointment frees its slot; booking that slot again (single,
+multi-slot or by rescheduling onto it) must leave the cancelled row on
+record, and a second live booking of the same slot must still fail.
+
+    python -m backend.tests.booking_test
+
+Runs against a fresh SQLite file and fakeredis.
+"""
+
+import os
+import tempfile
+from datetime import date
+
+
+def check(name, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {name}{f' | {detail}' if detail else ''}")
+    return ok
+
+
+def statuses(slot_id):
+    from backend.models.appointment import Appointment
+    from backend.utils.db import get_db_session
+
+    session = get_db_session()
+    try:
+        return sorted(
+            status
+            for (status,) in session.query(Appointment.status)
+            .filter(Appointment.slot_id == slot_id)
+            .order_by(Appointment.id)
+        )
+    finally:
+        session.close()
+
+
+def cancelled(book, slot_id, patient_id):
+    """Book `slot_id`, cancel it, and return the cancelled appointment id."""
+    from backend.services.appointment_service import cancel_appointment_service
+
+    appointment_id = book(slot_id, patient_id)
+    cancel_appointment_service(appointment_id=appointment_id, patient_id=patient_id)
+    return appointment_id
+
+
+def book_one(slot_id, patient_id):
+    from backend.services.appointment_service import book_appointment_service
+
+    return book_appointment_service(
+        patient_id=patient_id, doctor_id=1, slot_id=slot_id
+    )["appointment_id"]
+
+
+def book_many(slot_id, patient_id):
+    from backend.services.appointment_service import book_appointments_service
+
+    result = book_appointments_service(
+        patient_id=patient_id, doctor_id=1, slot_ids=[slot_id]
+    )
+    return result["appointments"][0]["appointment_id"]
+
+
+def status_of(appointment_id):
+    from backend.models.appointment import Appointment
+    from backend.utils.db import get_db_session
+
+    session = get_db_session()
+    try:
+        return (
+            session.query(Appointment.status)
+            .filter(Appointment.id == appointment_id)
+            .scalar()
+        )
+    finally:
+        session.close()
+
+
+def rebook(name, book, slot_id):
+    cancelled(book_one, slot_id, patient_id=2)
+    appointment_id = book(slot_id, 3)
+
+    return check(
+        f"{name} keeps the cancelled row and returns the new one",
+        statuses(slot_id) == ["booked", "cancelled"]
+        and status_of(appointment_id) == "booked",
+        f"statuses={statuses(slot_id)} returned={status_of(appointment_id)}",
+    )
+
+
+def reschedule_onto(slot_id, spare_slot_id):
+    from backend.services.appointment_service import reschedule_appointment_service
+
+    cancelled(book_one, slot_id, patient_id=2)
+    appointment_id = book_one(spare_slot_id, 3)
+    reschedule_appointment_service(
+        appointment_id=appointment_id, patient_id=3, new_slot_id=slot_id
+    )
+
+    return check(
+        "reschedule onto a cancelled slot keeps the cancelled row",
+        statuses(slot_id) == ["booked", "cancelled"] and statuses(spare_slot_id) == [],
+        f"statuses={statuses(slot_id)} spare={statuses(spare_slot_id)}",
+    )
+
+
+def second_live_booking(slot_id):
+    from sqlalchemy import insert
+    from sqlalchemy.exc import IntegrityError
+    from backend.models.appointment import Appointment
+    from backend.utils.db import engine
+
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                insert(Appointment).values(
+                    patient_id=4,
+                    doctor_id=1,
+                    slot_id=slot_id,
+                    appointment_date=date(2030, 1, 1),
+                    status="booked",
+                )
+            )
+        rejected = False
+    except IntegrityError:
+        rejected = True
+
+    return check("uq_slot_booking still rejects a second live booking", rejected)
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="booking_test_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'booking.db')}"
+
+    from backend.benchmarks.billing_worker_bench import use_fakeredis
+
+    use_fakeredis()
+
+    from backend.tests.race_test import seed
+    from backend.utils.db import engine
+
+    seed(engine, slots=5)
+
+    results = [
+        rebook("single booking", book_one, 1),
+        rebook("multi-slot booking", book_many, 2),
+        reschedule_onto(3, spare_slot_id=4),
+        second_live_booking(1),
+    ]
+
+    raise SystemExit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
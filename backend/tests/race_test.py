@@ -0,0 +1,263 @@
+"""
+Booking race test.
+
+C threads fight over each of N slots and the script checks that every
+slot ends up with exactly one appointment. It reports bookings/sec and DB
+statements per contender for each strategy:
+
+    hold  book_appointment_service (Redis slot hold + compare-and-set)
+    cas   the compare-and-set DB path alone (what runs if Redis is down)
+    lock  SELECT ... FOR UPDATE baseline
+
+    python -m backend.tests.race_test --slots 50 --contenders 10
+    python -m backend.tests.race_test --database-url mysql+pymysql://.../scratch
+
+Runs against a fresh SQLite file unless --database-url points at a scratch
+schema (its tables are dropped and recreated), and against fakeredis
+unless --redis env is given.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, time as dt_time, timedelta
+
+PATIENTS = 50
+
+
+def seed(engine, slots):
+    from sqlalchemy import insert
+    from backend.models.base import Base
+    from backend.models import (  # noqa: F401
+        appointment,
+        availability_slot,
+        department,
+        doctor,
+        doctor_schedule,
+        invoice,
+        medical_record,
+        user,
+    )
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    first_day = date(2030, 1, 1)
+
+    with engine.begin() as connection:
+        connection.execute(insert(department.Department), [{"id": 1, "name": "Race"}])
+        connection.execute(
+            insert(user.User),
+            [
+                {
+                    "id": i,
+                    "name": f"User {i}",
+                    "email": f"user{i}@race.local",
+                    "password": "x",
+                    "role": "doctor" if i == 1 else "patient",
+                }
+                for i in range(1, PATIENTS + 2)
+            ],
+        )
+        connection.execute(
+            insert(doctor.Doctor), [{"id": 1, "user_id": 1, "department_id": 1}]
+        )
+        connection.execute(
+            insert(availability_slot.AvailabilitySlot),
+            [
+                {
+                    "id": i,
+                    "doctor_id": 1,
+                    "date": first_day + timedelta(days=i // 500),
+                    "start_time": dt_time((i % 500) // 60, (i % 500) % 60),
+                    "end_time": dt_time((i % 500) // 60, (i % 500) % 60, 30),
+                    "is_booked": False,
+                }
+                for i in range(1, slots + 1)
+            ],
+        )
+
+
+def book_with_row_lock(patient_id, doctor_id, slot_id):
+    """Baseline: lock the slot row, check it, then insert."""
+    from backend.models.appointment import Appointment
+    from backend.models.availability_slot import AvailabilitySlot
+    from backend.services.appointment_service import BookingConflictError
+    from backend.utils.db import get_db_session
+
+    session = get_db_session()
+    try:
+        slot = (
+            session.query(AvailabilitySlot)
+            .filter(
+                AvailabilitySlot.id == slot_id,
+                AvailabilitySlot.doctor_id == doctor_id,
+            )
+            .with_for_update()
+            .first()
+        )
+
+        if not slot or slot.is_booked:
+            session.rollback()
+            raise BookingConflictError("Slot is not available")
+
+        slot.is_booked = True
+        appointment = Appointment(
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            slot_id=slot_id,
+            appointment_date=slot.date,
+            status="booked",
+        )
+        session.add(appointment)
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    finally:
+        session.close()
+
+
+def run(strategy, book, slots, contenders):
+    from redis.exceptions import RedisError
+    from sqlalchemy import event, func
+    from sqlalchemy.exc import IntegrityError
+    from backend.models.appointment import Appointment
+    from backend.services.appointment_service import BookingConflictError
+    from backend.utils.db import engine, get_db_session
+    from backend.utils.redis_client import redis_client
+
+    seed(engine, slots)
+
+    try:
+        keys = list(redis_client.scan_iter(match="slot_hold:*", count=1000))
+        if keys:
+            redis_client.delete(*keys)
+    except RedisError:
+        pass  # Redis down: holds are skipped and booking runs on the DB alone
+
+    local = threading.local()
+    statements = {"won": [], "lost": []}
+    outcomes = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(contenders)
+
+    def count_statement(*args, **kwargs):
+        local.statements = getattr(local, "statements", 0) + 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    def contender(index):
+        patient_id = 2 + index % PATIENTS
+        barrier.wait()
+
+        for slot_id in range(1, slots + 1):
+            local.statements = 0
+            try:
+                book(patient_id=patient_id, doctor_id=1, slot_id=slot_id)
+                outcome = "won"
+            except BookingConflictError:
+                outcome = "lost"
+            except IntegrityError:
+                outcome = "integrity_error"
+            except Exception as e:
+                outcome = f"error:{type(e).__name__}"
+
+            with lock:
+                outcomes[outcome] += 1
+                if outcome in statements:
+                    statements[outcome].append(local.statements)
+
+    threads = [threading.Thread(target=contender, args=(i,)) for i in range(contenders)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    event.remove(engine, "before_cursor_execute", count_statement)
+
+    session = get_db_session()
+    try:
+        per_slot = dict(
+            session.query(Appointment.slot_id, func.count(Appointment.id))
+            .group_by(Appointment.slot_id)
+            .all()
+        )
+    finally:
+        session.close()
+
+    double_booked = sum(1 for count in per_slot.values() if count > 1)
+    unbooked = slots - len(per_slot)
+
+    def avg(values):
+        return sum(values) / len(values) if values else 0.0
+
+    ok = double_booked == 0 and unbooked == 0 and outcomes["won"] == slots
+    print(
+        f"{'✅' if ok else '❌'} {strategy:<8} | slots={slots} | "
+        f"contenders={contenders} | {slots / elapsed:.1f} bookings/s | "
+        f"{slots * contenders / elapsed:.1f} attempts/s | "
+        f"statements won={avg(statements['won']):.2f} "
+        f"lost={avg(statements['lost']):.2f} | outcomes={dict(outcomes)} | "
+        f"double_booked={double_booked} | unbooked={unbooked}"
+    )
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Appointment booking race test")
+    parser.add_argument("--slots", type=int, default=50)
+    parser.add_argument("--contenders", type=int, default=10)
+    parser.add_argument(
+        "--strategy", choices=("hold", "cas", "lock", "all"), default="all"
+    )
+    parser.add_argument("--database-url", help="Scratch database to use")
+    parser.add_argument(
+        "--redis",
+        choices=("fake", "env"),
+        default="fake",
+        help="fakeredis or the REDIS_* settings (hold strategy)",
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="race_test_")
+    os.environ["DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{os.path.join(workdir, 'race.db')}"
+    )
+
+    if args.redis == "fake":
+        from backend.benchmarks.billing_worker_bench import use_fakeredis
+
+        use_fakeredis()
+
+    from backend.services.appointment_service import (
+        _claim_slot_and_book,
+        book_appointment_service,
+    )
+
+    strategies = {
+        "hold": book_appointment_service,
+        "cas": _claim_slot_and_book,
+        "lock": book_with_row_lock,
+    }
+    selected = strategies if args.strategy == "all" else [args.strategy]
+
+    results = [
+        run(name, strategies[name], max(1, args.slots), max(1, args.contenders))
+        for name in selected
+    ]
+
+    raise SystemExit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from backend.utils.db import build_database_url
+
+# -------------------------------------------------
+# Async engine for asyncio workers.
+# Same credentials as backend/utils/db.py, async driver (aiomysql/asyncmy).
+# -------------------------------------------------
+ASYNC_DB_DRIVER = os.getenv("ASYNC_DB_DRIVER", "aiomysql")
+
+async_engine = create_async_engine(
+    build_database_url(ASYNC_DB_DRIVER),
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", 20)),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 20)),
+    pool_recycle=1800,
+    echo=os.getenv("SQL_ECHO", "False") == "True",
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def get_async_db_session():
+    return AsyncSessionLocal()
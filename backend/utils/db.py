@@ -11,10 +11,13 @@ from urllib.parse import quote_plus
 BASE_DIR = Path(__file__).resolve().parent.parent
 env_path = BASE_DIR / ".env"
 
-if not env_path.exists():
+# DATABASE_URL (e.g. sqlite:///bench.db) bypasses .env and the MySQL
+# settings below; used by benchmarks and local tooling.
+if not env_path.exists() and not os.getenv("DATABASE_URL"):
     raise RuntimeError(f".env file not found at expected location: {env_path}")
 
-load_dotenv(dotenv_path=env_path)
+if env_path.exists():
+    load_dotenv(dotenv_path=env_path)
 
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
@@ -22,17 +25,24 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME")
 
-if not all([DB_USER, DB_PASSWORD, DB_NAME]):
+if not os.getenv("DATABASE_URL") and not all([DB_USER, DB_PASSWORD, DB_NAME]):
     raise RuntimeError(
         "Database environment variables are not set properly. Check backend/.env file."
     )
 
 # Safely encode password (important if it contains special characters)
-DB_PASSWORD_ENCODED = quote_plus(DB_PASSWORD)
+DB_PASSWORD_ENCODED = quote_plus(DB_PASSWORD or "")
 
-DATABASE_URL = (
-    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD_ENCODED}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+
+def build_database_url(driver="pymysql"):
+    """Same credentials/host for every MySQL driver (sync or async)."""
+    return (
+        f"mysql+{driver}://{DB_USER}:{DB_PASSWORD_ENCODED}"
+        f"@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+
+
+DATABASE_URL = os.getenv("DATABASE_URL") or build_database_url()
 
 engine = create_engine(
     DATABASE_URL,
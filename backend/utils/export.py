@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, time
+from flask import Response, stream_with_context
+from backend.utils.db import get_db_session
+
+# -------------------------------------------------
+# Streaming exports (NDJSON / CSV)
+#
+# stream_query runs a SELECT with stream_results, which on mysql+pymysql
+# means an unbuffered SSCursor: rows leave MySQL as the client reads them
+# and are fetched yield_per at a time, so memory stays flat whatever the
+# table size. Each batch is encoded into one text chunk and handed to a
+# Flask generator response, so the first bytes go out before the query
+# has finished. The session lives as long as the response body.
+# -------------------------------------------------
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+
+def check_export_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _encode(columns, rows, fmt):
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({column: _plain(value) for column, value in zip(columns, row)})
+            + "\n"
+            for row in rows
+        )
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([[_plain(value) for value in row] for row in rows])
+    return buffer.getvalue()
+
+
+def stream_query(statement, columns, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Yield `statement`'s rows as encoded text chunks, one per batch."""
+    session = get_db_session()
+
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(columns)
+            yield buffer.getvalue()
+
+        result = session.execute(
+            statement.execution_options(stream_results=True, yield_per=batch_size)
+        )
+
+        for rows in result.partitions():
+            yield _encode(columns, rows, fmt)
+
+    finally:
+        session.close()
+
+
+def export_response(chunks, fmt, filename):
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+            # Stop reverse proxies from buffering the whole body
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import json
+import os
+import time
+import redis
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from backend.utils.metrics import Counter
+from backend.utils.redis_client import redis_client
+
+# -------------------------------------------------
+# Idempotency-Key support for retried POST/PUT requests
+#
+#   idempotency:{user}:{method}:{path}:{key} = JSON record
+#       {"state": "pending", "fingerprint": ...}       while the first runs
+#       {"state": "done", "fingerprint": ..., "status": ..., "body": ...}
+#
+# The first request claims the key with SET NX and runs the view; its
+# response (anything below 500) is stored for IDEMPOTENCY_TTL seconds and
+# replayed to every retry with the same key. Retries that arrive while
+# the first is still running poll the record instead of reaching MySQL.
+# A 5xx drops the record so the client can retry for real. Keys are per
+# user and endpoint; a key reused with a different body is rejected (422).
+# Without the header, or when Redis is down, requests run as usual.
+# -------------------------------------------------
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_PREFIX = "idempotency:"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))  # seconds
+IDEMPOTENCY_LOCK_TTL_MS = int(os.getenv("IDEMPOTENCY_LOCK_TTL_MS", 30000))
+IDEMPOTENCY_WAIT_MS = int(os.getenv("IDEMPOTENCY_WAIT_MS", 10000))
+POLL_INTERVAL = 0.05  # seconds
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by result",
+    ["result"],  # first | replayed | in_progress | mismatch | error
+)
+
+
+def _record_key(idempotency_key):
+    return (
+        f"{IDEMPOTENCY_PREFIX}{get_jwt_identity()}:{request.method}:"
+        f"{request.path}:{idempotency_key}"
+    )
+
+
+def _replay(record):
+    response = make_response(record["body"], record["status"])
+    response.headers["Content-Type"] = record["content_type"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _wait_for(key, fingerprint):
+    """
+    Poll until the first request finishes. Returns its record (still
+    pending if the wait timed out, at once if it is for a different
+    body), or None once the key was released because the first failed.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_MS / 1000
+
+    while True:
+        raw = redis_client.get(key)
+        if raw is None:
+            return None
+
+        record = json.loads(raw)
+        if (
+            record["state"] == "done"
+            or record["fingerprint"] != fingerprint
+            or time.monotonic() >= deadline
+        ):
+            return record
+
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(view):
+    """Wrap a view (inside @jwt_required) to honour Idempotency-Key."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return view(*args, **kwargs)
+
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} is too long"}), 400
+
+        key = _record_key(idempotency_key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        pending = json.dumps({"state": "pending", "fingerprint": fingerprint})
+
+        try:
+            while not redis_client.set(
+                key, pending, nx=True, px=IDEMPOTENCY_LOCK_TTL_MS
+            ):
+                record = _wait_for(key, fingerprint)
+                if record is None:
+                    continue  # first attempt failed and released the key
+
+                if record["fingerprint"] != fingerprint:
+                    IDEMPOTENCY_REQUESTS.inc(result="mismatch")
+                    return jsonify(
+                        {
+                            "error": f"{IDEMPOTENCY_HEADER} was already used "
+                            "with a different request"
+                        }
+                    ), 422
+
+                if record["state"] != "done":
+                    IDEMPOTENCY_REQUESTS.inc(result="in_progress")
+                    return jsonify(
+                        {"error": "A request with this key is still in progress"}
+                    ), 409
+
+                IDEMPOTENCY_REQUESTS.inc(result="replayed")
+                return _replay(record)
+
+        except redis.exceptions.RedisError as e:
+            IDEMPOTENCY_REQUESTS.inc(result="error")
+            print(f"⚠️ Idempotency store unavailable | error={str(e)}")
+            return view(*args, **kwargs)
+
+        IDEMPOTENCY_REQUESTS.inc(result="first")
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(key)
+            raise
+
+        if response.status_code >= 500:
+            _release(key)
+            return response
+
+        try:
+            redis_client.set(
+                key,
+                json.dumps(
+                    {
+                        "state": "done",
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "content_type": response.content_type,
+                        "body": response.get_data(as_text=True),
+                    }
+                ),
+                ex=IDEMPOTENCY_TTL,
+            )
+        except redis.exceptions.RedisError as e:
+            # Retries will run again; the services still refuse double work
+            print(f"⚠️ Idempotency record not stored | error={str(e)}")
+
+        return response
+
+    return wrapper
+
+
+def _release(key):
+    try:
+        redis_client.delete(key)
+    except redis.exceptions.RedisError as e:
+        print(f"⚠️ Idempotency key release failed | error={str(e)}")
@@ -1,8 +1,21 @@
 import redis
 import os
 
-redis_client = redis.Redis(
+# One pool per process, shared by the API, the billing queue and workers.
+# health_check_interval replaces an explicit PING before every command;
+# socket_timeout must stay above the longest blocking read (BLMOVE).
+REDIS_SETTINGS = dict(
     host=os.getenv("REDIS_HOST", "localhost"),
     port=int(os.getenv("REDIS_PORT", 6379)),
+    db=int(os.getenv("REDIS_DB", 0)),
+    password=os.getenv("REDIS_PASSWORD") or None,
+    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
     decode_responses=True,
+    socket_connect_timeout=5,
+    socket_timeout=int(os.getenv("REDIS_SOCKET_TIMEOUT", 10)),
+    health_check_interval=30,
 )
+
+redis_pool = redis.ConnectionPool(**REDIS_SETTINGS)
+
+redis_client = redis.Redis(connection_pool=redis_pool)
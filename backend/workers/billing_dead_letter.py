@@ -0,0 +1,57 @@
+"""
+Inspect and replay the billing dead-letter queue.
+
+    python -m backend.workers.billing_dead_letter list --limit 20
+    python -m backend.workers.billing_dead_letter replay --count 10
+    python -m backend.workers.billing_dead_letter replay --all
+    python -m backend.workers.billing_dead_letter purge
+"""
+
+import argparse
+from backend.services.billing_queue import (
+    BILLING_DEAD_QUEUE,
+    list_dead_jobs,
+    purge_dead_jobs,
+    replay_dead_jobs,
+)
+from backend.utils.redis_client import redis_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Billing dead-letter queue tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_cmd = sub.add_parser("list", help="Show dead-lettered jobs")
+    list_cmd.add_argument("--limit", type=int, default=50)
+
+    replay_cmd = sub.add_parser("replay", help="Move jobs back onto billing_queue")
+    group = replay_cmd.add_mutually_exclusive_group(required=True)
+    group.add_argument("--count", type=int)
+    group.add_argument("--all", action="store_true")
+
+    sub.add_parser("purge", help="Delete every dead-lettered job")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print(
+            f"📦 {BILLING_DEAD_QUEUE}: {redis_client.llen(BILLING_DEAD_QUEUE)} job(s)"
+        )
+        for entry in list_dead_jobs(limit=args.limit):
+            print(
+                f"- failed_at={entry.get('failed_at')} | "
+                f"worker={entry.get('worker_id')} | "
+                f"reason={entry.get('reason')} | job={entry.get('job')}"
+            )
+
+    elif args.command == "replay":
+        replayed = replay_dead_jobs(count=None if args.all else args.count)
+        print(f"🔁 Replayed {replayed} dead-lettered job(s)")
+
+    elif args.command == "purge":
+        purge_dead_jobs()
+        print(f"🗑️ Purged {BILLING_DEAD_QUEUE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,99 @@
+import argparse
 import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
 import time
-from backend.utils.redis_client import redis_client
-from backend.utils.db import get_db_session
+from backend.utils.db import engine, get_db_session
 from backend.models.appointment import Appointment
-from backend.services.billing_service import create_invoice_for_appointment
+from backend.services.billing_metrics import (
+    BATCH_SECONDS,
+    JOB_SECONDS,
+    record_settlement,
+)
+from backend.services.billing_service import (
+    create_invoice_for_appointment,
+    create_invoices_for_appointments,
+)
+from backend.services.billing_queue import (
+    BILLING_DEAD_QUEUE,
+    VISIBILITY_TIMEOUT,
+    ack_billing_job,
+    dead_letter_billing_job,
+    default_worker_id,
+    heartbeat,
+    promote_scheduled_jobs,
+    reap_stalled_jobs,
+    reserve_billing_jobs,
+    retire_worker,
+    retry_billing_job,
+)
+from backend.utils.metrics import start_metrics_server
 from sqlalchemy.orm import joinedload
 
-BILLING_QUEUE = "billing_queue"
+DEFAULT_BATCH_SIZE = int(os.getenv("BILLING_BATCH_SIZE", 1))
+REAP_INTERVAL = max(1, VISIBILITY_TIMEOUT // 4)  # seconds
+PROMOTE_INTERVAL = 1  # seconds
+STATS_INTERVAL = int(os.getenv("BILLING_STATS_INTERVAL", 30))  # seconds
+METRICS_PORT = int(os.getenv("BILLING_METRICS_PORT", 0))  # 0 = disabled
+
+
+class ThroughputCounter:
+    """Per-process job counters shared by the worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def record(self, error):
+        with self._lock:
+            if error is None:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self.processed, self.failed
+
+
+def parse_job(job_json):
+    """
+    Decode a raw queue entry into an appointment_id.
+    Returns None for poison jobs (bad JSON / missing or invalid id).
+    """
+    try:
+        job_data = json.loads(job_json)
+    except (TypeError, ValueError):
+        return None
+
+    if not isinstance(job_data, dict):
+        return None
+
+    appointment_id = job_data.get("appointment_id")
+
+    if not isinstance(appointment_id, int) or appointment_id <= 0:
+        return None
+
+    return appointment_id
 
 
 def process_job(job_data):
+    """
+    Invoice a single appointment.
+    Raises ValueError for jobs that can never succeed (dead-letter) and
+    lets any other exception through so the job is retried.
+    """
     session = get_db_session()
+    started = time.perf_counter()
     try:
         appointment_id = job_data.get("appointment_id")
 
         if not appointment_id:
-            print("❌ Invalid job data:", job_data)
-            return
+            raise ValueError("Invalid job data")
 
         appointment = (
             session.query(Appointment)
@@ -26,39 +103,328 @@ def process_job(job_data):
         )
 
         if not appointment:
-            print(f"❌ Appointment not found: {appointment_id}")
-            return
+            raise ValueError(f"Appointment not found: {appointment_id}")
 
         invoice = create_invoice_for_appointment(session, appointment)
         session.commit()
 
         print(f"✅ Invoice ready | id={invoice.id} | appointment={appointment_id}")
 
-    except Exception as e:
+    except Exception:
         session.rollback()
-        print(f"❌ Worker error: {str(e)}")
+        raise
 
     finally:
         session.close()
+        JOB_SECONDS.observe(time.perf_counter() - started)
+
+
+def process_batch(job_jsons):
+    """
+    Invoice a batch of queued jobs in one transaction:
+    - one IN query for appointments + doctors
+    - one idempotency query for existing invoices
+    - one multi-row INSERT for the missing invoices
+
+    Poison jobs are dropped up front. If the batch transaction itself
+    fails, every job is retried on its own so one bad appointment cannot
+    fail the rest.
+
+    Returns [(job_json, error)] with error None for committed jobs.
+    """
+
+    outcomes = {}
+    jobs_by_appointment = {}
+
+    for job_json in job_jsons:
+        appointment_id = parse_job(job_json)
+
+        if appointment_id is None:
+            outcomes[job_json] = ValueError("Invalid job data")
+            continue
+
+        jobs_by_appointment.setdefault(appointment_id, []).append(job_json)
+
+    if jobs_by_appointment:
+        session = get_db_session()
+        started = time.perf_counter()
+        try:
+            appointments = (
+                session.query(Appointment)
+                .options(joinedload(Appointment.doctor))
+                .filter(Appointment.id.in_(list(jobs_by_appointment)))
+                .all()
+            )
+
+            found = {a.id for a in appointments}
+
+            result = create_invoices_for_appointments(session, appointments)
+            session.commit()
+
+            for appointment_id, raws in jobs_by_appointment.items():
+                error = None
+                if appointment_id not in found:
+                    error = ValueError(f"Appointment not found: {appointment_id}")
+                for job_json in raws:
+                    outcomes[job_json] = error
+
+            print(
+                f"✅ Batch invoiced | jobs={len(job_jsons)} | "
+                f"created={len(result['created'])} | "
+                f"existing={len(result['existing'])}"
+            )
+
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Batch failed, falling back to single jobs | error={str(e)}")
+
+            for appointment_id, raws in jobs_by_appointment.items():
+                try:
+                    process_job({"appointment_id": appointment_id})
+                    error = None
+                except Exception as job_error:
+                    error = job_error
+                for job_json in raws:
+                    outcomes[job_json] = error
+
+        finally:
+            session.close()
+            BATCH_SECONDS.observe(time.perf_counter() - started)
+
+    return [(job_json, outcomes[job_json]) for job_json in job_jsons]
+
+
+def settle_job(worker_id, receipt, job_json, error):
+    """Ack, retry or dead-letter one reserved job based on its outcome."""
+    if error is None:
+        ack_billing_job(worker_id, receipt, job_json)
+        record_settlement("acked")
+    elif isinstance(error, ValueError):
+        dead_letter_billing_job(worker_id, receipt, job_json, str(error))
+        record_settlement("dead", error)
+    else:
+        print(f"❌ Worker error: {str(error)}")
+        target = retry_billing_job(worker_id, receipt, job_json, str(error))
+        record_settlement("dead" if target == BILLING_DEAD_QUEUE else "retried", error)
 
 
-def start_worker():
-    print("🚀 Billing worker started...")
+def start_worker(
+    batch_size=DEFAULT_BATCH_SIZE, worker_id=None, stop_event=None, counter=None
+):
+    """
+    Reserve -> process -> settle loop. Runs until `stop_event` is set;
+    the current reservation is always settled before the loop exits.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    print(f"🚀 Billing worker started... | id={worker_id} | batch_size={batch_size}")
 
-    while True:
+    last_reap = last_promote = 0.0
+
+    while not stop_event.is_set():
         try:
-            result = redis_client.blpop(BILLING_QUEUE, timeout=5)
+            heartbeat(worker_id)
+
+            if time.time() - last_promote >= PROMOTE_INTERVAL:
+                promote_scheduled_jobs()
+                last_promote = time.time()
+
+            if time.time() - last_reap >= REAP_INTERVAL:
+                reap_stalled_jobs()
+                last_reap = time.time()
+
+            reserved = reserve_billing_jobs(worker_id, count=batch_size)
+
+            if not reserved:
+                continue
 
-            if result:
-                _, job_json = result
-                job_data = json.loads(job_json)
+            job_jsons = [job_json for _, job_json in reserved]
 
-                process_job(job_data)
+            if batch_size > 1:
+                outcomes = process_batch(job_jsons)
+            else:
+                outcomes = []
+                for job_json in job_jsons:
+                    try:
+                        appointment_id = parse_job(job_json)
+                        if appointment_id is None:
+                            raise ValueError("Invalid job data")
+                        process_job({"appointment_id": appointment_id})
+                        outcomes.append((job_json, None))
+                    except Exception as e:
+                        outcomes.append((job_json, e))
+
+            for (receipt, job_json), (_, error) in zip(reserved, outcomes):
+                settle_job(worker_id, receipt, job_json, error)
+                if counter:
+                    counter.record(error)
 
         except Exception as e:
             print(f"❌ Worker error: {str(e)}")
             time.sleep(1)
 
+    retire_worker(worker_id)
+    print(f"🛑 Billing worker stopped | id={worker_id}")
+
+
+# -------------------------------------------------
+# Worker pool
+#
+#   supervisor -> N processes (fork) -> M threads, each its own consumer
+#
+# Every thread has its own processing list, so the reliable-queue
+# protocol and the SAVEPOINT/IntegrityError idempotency in
+# create_invoice_for_appointment hold exactly as for a single worker.
+# -------------------------------------------------
+def run_worker_process(index, threads, batch_size, metrics_port=METRICS_PORT):
+    # Connections inherited from the parent must not be shared across the
+    # fork; drop them without closing the parent's sockets. The redis-py
+    # pool detects the new pid and reconnects on its own.
+    engine.dispose(close=False)
+
+    # One endpoint per process: process i listens on metrics_port + i
+    if metrics_port:
+        start_metrics_server(metrics_port + index)
+        print(f"📈 Billing metrics on :{metrics_port + index}/metrics")
+
+    stop_event = threading.Event()
+    counter = ThroughputCounter()
+
+    def request_stop(signum, frame):
+        print(f"🛑 Process {index} draining in-flight jobs...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    host, pid = socket.gethostname(), os.getpid()
+    workers = [
+        threading.Thread(
+            target=start_worker,
+            kwargs={
+                "batch_size": batch_size,
+                "worker_id": f"{host}:{pid}:{t}",
+                "stop_event": stop_event,
+                "counter": counter,
+            },
+            name=f"billing-worker-{index}-{t}",
+            daemon=True,
+        )
+        for t in range(threads)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    started = last_log = time.time()
+    last_processed = 0
+
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(timeout=1)
+
+        now = time.time()
+        if now - last_log >= STATS_INTERVAL:
+            processed, failed = counter.snapshot()
+            rate = (processed - last_processed) / (now - last_log)
+            print(
+                f"📊 Billing process {index} | pid={pid} | processed={processed} | "
+                f"failed={failed} | rate={rate:.1f}/s"
+            )
+            last_log, last_processed = now, processed
+
+    processed, failed = counter.snapshot()
+    elapsed = max(time.time() - started, 1e-9)
+    print(
+        f"📊 Billing process {index} finished | pid={pid} | processed={processed} | "
+        f"failed={failed} | avg={processed / elapsed:.1f}/s"
+    )
+
+
+def run_pool(
+    processes, threads, batch_size=DEFAULT_BATCH_SIZE, metrics_port=METRICS_PORT
+):
+    """
+    Supervisor: forks `processes` workers, restarts any that die, and on
+    SIGTERM/SIGINT forwards the signal and waits for them to drain.
+    """
+    if processes == 1:
+        run_worker_process(0, threads, batch_size, metrics_port)
+        return
+
+    ctx = multiprocessing.get_context("fork")
+    shutting_down = threading.Event()
+
+    def spawn(index):
+        process = ctx.Process(
+            target=run_worker_process,
+            args=(index, threads, batch_size, metrics_port),
+            name=f"billing-process-{index}",
+        )
+        process.start()
+        return process
+
+    def request_stop(signum, frame):
+        print("🛑 Supervisor shutting down billing pool...")
+        shutting_down.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    pool = [spawn(index) for index in range(processes)]
+    print(f"🚀 Billing pool started | processes={processes} | threads={threads}")
+
+    while not shutting_down.is_set():
+        for index, process in enumerate(pool):
+            if not process.is_alive():
+                print(
+                    f"⚠️ Billing process {index} exited "
+                    f"(code={process.exitcode}), restarting"
+                )
+                pool[index] = spawn(index)
+        shutting_down.wait(1)
+
+    for process in pool:
+        if process.is_alive():
+            process.terminate()  # SIGTERM -> drain
+
+    for process in pool:
+        process.join()
+
+    print("🛑 Billing pool stopped")
+
 
 if __name__ == "__main__":
-    start_worker()
+    parser = argparse.ArgumentParser(description="MediSync billing worker")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Max jobs drained and invoiced per transaction (1 = single-job mode)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=int(os.getenv("BILLING_PROCESSES", 1)),
+        help="Worker processes to fork",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=int(os.getenv("BILLING_THREADS", 1)),
+        help="Consumer threads per process",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Serve /metrics on this port (+ process index); 0 disables it",
+    )
+    args = parser.parse_args()
+
+    run_pool(
+        processes=max(1, args.processes),
+        threads=max(1, args.threads),
+        batch_size=max(1, args.batch_size),
+        metrics_port=max(0, args.metrics_port),
+    )
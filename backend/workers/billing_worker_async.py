@@ -0,0 +1,264 @@
+"""
+Asyncio billing worker.
+
+Same queue protocol and invoice logic as billing_worker.py, but keeps up
+to --concurrency jobs in flight on a single event loop:
+
+    python -m backend.workers.billing_worker_async --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import time
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from backend.models.appointment import Appointment
+from backend.services import billing_queue
+from backend.services.billing_metrics import JOB_SECONDS, record_settlement
+from backend.services.billing_queue import (
+    ACK_SCRIPT_SOURCE,
+    BILLING_DEAD_QUEUE,
+    BILLING_GROUP,
+    BILLING_QUEUE,
+    BILLING_STREAM,
+    BILLING_WORKERS,
+    ack_args,
+    dead_letter_billing_job,
+    default_worker_id,
+    ensure_billing_stream_group,
+    processing_list,
+    promote_scheduled_jobs,
+    reap_stalled_jobs,
+    retire_worker,
+    retry_billing_job,
+)
+from backend.services.billing_service import create_invoice_for_appointment_async
+from backend.utils.async_db import async_engine, get_async_db_session
+from backend.utils.metrics import start_metrics_server
+from backend.utils.redis_client import REDIS_SETTINGS
+from backend.workers.billing_worker import (
+    METRICS_PORT,
+    PROMOTE_INTERVAL,
+    REAP_INTERVAL,
+    parse_job,
+)
+
+DEFAULT_CONCURRENCY = int(os.getenv("BILLING_ASYNC_CONCURRENCY", 200))
+
+
+async def process_job_async(job_data):
+    """
+    Async twin of billing_worker.process_job.
+    Raises ValueError for jobs that can never succeed (dead-letter) and
+    lets any other exception through so the job is retried.
+    """
+    appointment_id = job_data.get("appointment_id")
+
+    if not appointment_id:
+        raise ValueError("Invalid job data")
+
+    async with get_async_db_session() as session:
+        try:
+            result = await session.execute(
+                select(Appointment)
+                .options(joinedload(Appointment.doctor))
+                .where(Appointment.id == appointment_id)
+            )
+            appointment = result.scalars().first()
+
+            if not appointment:
+                raise ValueError(f"Appointment not found: {appointment_id}")
+
+            invoice = await create_invoice_for_appointment_async(session, appointment)
+            await session.commit()
+
+            print(f"✅ Invoice ready | id={invoice.id} | appointment={appointment_id}")
+
+        except Exception:
+            await session.rollback()
+            raise
+
+
+# -------------------------------------------------
+# Queue operations on redis.asyncio
+#
+# Only the hot path (heartbeat, reserve, ack) is re-implemented here.
+# Retries, dead-lettering, promotion and reaping are rare/periodic and
+# reuse the sync implementations from billing_queue in a thread.
+# -------------------------------------------------
+async def heartbeat_async(client, worker_id):
+    if billing_queue.BILLING_TRANSPORT == "stream":
+        return
+
+    await client.zadd(BILLING_WORKERS, {worker_id: time.time()})
+
+
+async def reserve_billing_job_async(client, worker_id, timeout=2):
+    """Reserve one job; returns (receipt, job_json) or None."""
+    if billing_queue.BILLING_TRANSPORT == "stream":
+        try:
+            response = await client.xreadgroup(
+                BILLING_GROUP,
+                worker_id,
+                {BILLING_STREAM: ">"},
+                count=1,
+                block=int(timeout * 1000),
+            )
+        except redis.exceptions.ResponseError as e:
+            if "NOGROUP" not in str(e):
+                raise
+            await asyncio.to_thread(ensure_billing_stream_group)
+            return None
+
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                return entry_id, fields.get("job")
+
+        return None
+
+    job_json = await client.blmove(
+        BILLING_QUEUE, processing_list(worker_id), timeout, "LEFT", "RIGHT"
+    )
+
+    if job_json is None:
+        return None
+
+    return job_json, job_json
+
+
+async def ack_billing_job_async(client, worker_id, receipt, job_json):
+    keys, args = ack_args(worker_id, receipt, job_json)
+    return bool(await client.register_script(ACK_SCRIPT_SOURCE)(keys=keys, args=args))
+
+
+async def handle_job(client, worker_id, receipt, job_json, semaphore):
+    try:
+        appointment_id = parse_job(job_json)
+
+        if appointment_id is None:
+            raise ValueError("Invalid job data")
+
+        started = time.perf_counter()
+        try:
+            await process_job_async({"appointment_id": appointment_id})
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - started)
+
+        await ack_billing_job_async(client, worker_id, receipt, job_json)
+        record_settlement("acked")
+
+    except ValueError as e:
+        await asyncio.to_thread(
+            dead_letter_billing_job, worker_id, receipt, job_json, str(e)
+        )
+        record_settlement("dead", e)
+
+    except Exception as e:
+        print(f"❌ Worker error: {str(e)}")
+        target = await asyncio.to_thread(
+            retry_billing_job, worker_id, receipt, job_json, str(e)
+        )
+        record_settlement("dead" if target == BILLING_DEAD_QUEUE else "retried", e)
+
+    finally:
+        semaphore.release()
+
+
+async def start_async_worker(concurrency=DEFAULT_CONCURRENCY, worker_id=None):
+    """
+    Reserve jobs as long as fewer than `concurrency` are in flight.
+    SIGTERM/SIGINT stops reserving and waits for in-flight jobs to settle.
+    """
+    worker_id = worker_id or default_worker_id()
+    # One connection per in-flight job plus the reserve loop, and a pool
+    # that waits for a free connection instead of raising "Too many
+    # connections" (which would send already-invoiced jobs into retry).
+    settings = dict(
+        REDIS_SETTINGS,
+        max_connections=max(REDIS_SETTINGS["max_connections"], concurrency + 2),
+    )
+    client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(**settings))
+    semaphore = asyncio.Semaphore(concurrency)
+    stop_event = asyncio.Event()
+    in_flight = set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    print(
+        f"🚀 Async billing worker started... | id={worker_id} | "
+        f"concurrency={concurrency}"
+    )
+
+    last_reap = last_promote = 0.0
+
+    try:
+        while not stop_event.is_set():
+            await semaphore.acquire()
+
+            try:
+                await heartbeat_async(client, worker_id)
+
+                if time.time() - last_promote >= PROMOTE_INTERVAL:
+                    await asyncio.to_thread(promote_scheduled_jobs)
+                    last_promote = time.time()
+
+                if time.time() - last_reap >= REAP_INTERVAL:
+                    await asyncio.to_thread(reap_stalled_jobs)
+                    last_reap = time.time()
+
+                reserved = await reserve_billing_job_async(client, worker_id)
+
+            except Exception as e:
+                semaphore.release()
+                print(f"❌ Worker error: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+
+            if reserved is None:
+                semaphore.release()
+                continue
+
+            receipt, job_json = reserved
+            task = asyncio.create_task(
+                handle_job(client, worker_id, receipt, job_json, semaphore)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        print(f"🛑 Draining {len(in_flight)} in-flight billing job(s)...")
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+    finally:
+        await asyncio.to_thread(retire_worker, worker_id)
+        await client.aclose()
+        await async_engine.dispose()
+        print(f"🛑 Async billing worker stopped | id={worker_id}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MediSync asyncio billing worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Max billing jobs in flight at once",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Serve /metrics on this port; 0 disables it",
+    )
+    args = parser.parse_args()
+
+    if args.metrics_port > 0:
+        start_metrics_server(args.metrics_port)
+        print(f"📈 Billing metrics on :{args.metrics_port}/metrics")
+
+    asyncio.run(start_async_worker(concurrency=max(1, args.concurrency)))
@@ -0,0 +1,67 @@
+"""
+Keep the next N days of availability slots generated from DoctorSchedule.
+
+    python -m backend.workers.slot_materializer --horizon-days 60          # once (cron)
+    python -m backend.workers.slot_materializer --horizon-days 60 --every 3600
+"""
+
+import argparse
+import os
+import signal
+import threading
+from backend.services.availability_slot_service import materialize_slots_service
+
+DEFAULT_HORIZON_DAYS = int(os.getenv("SLOT_HORIZON_DAYS", 60))
+
+
+def run_once(horizon_days):
+    result = materialize_slots_service(horizon_days)
+    print(
+        f"🗓️ Slots materialized | through={result['through']} | "
+        f"doctors={result['doctors']} | days={result['days']} | "
+        f"created={result['created']} | skipped={result['skipped']}"
+    )
+    return result
+
+
+def run_forever(horizon_days, every):
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        print("🛑 Slot materializer stopping...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    print(f"🚀 Slot materializer started | horizon={horizon_days}d | every={every}s")
+
+    while not stop_event.is_set():
+        try:
+            run_once(horizon_days)
+        except Exception as e:
+            print(f"❌ Slot materializer error: {str(e)}")
+
+        stop_event.wait(every)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MediSync slot materializer")
+    parser.add_argument(
+        "--horizon-days",
+        type=int,
+        default=DEFAULT_HORIZON_DAYS,
+        help="Days ahead (from today) that must have slots",
+    )
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=0,
+        help="Re-run every N seconds; 0 runs once and exits",
+    )
+    args = parser.parse_args()
+
+    if args.every > 0:
+        run_forever(max(1, args.horizon_days), args.every)
+    else:
+        run_once(max(1, args.horizon_days))
@@ -0,0 +1,39 @@
+-- Indexes declared on the SQLAlchemy models. create_all() only adds them
+-- to new tables; apply these to an existing database.
+
+-- GET /api/appointments/next-available: open slots in (date, start_time)
+-- order, joined to doctors by primary key.
+CREATE INDEX ix_slots_open_by_time
+    ON availability_slots (is_booked, date, start_time);
+
+-- GET /api/invoices: newest first on (created_at, id), optionally narrowed
+-- by status, doctor or patient. InnoDB appends the primary key to every
+-- secondary index, so each of these ends in (created_at, id).
+CREATE INDEX ix_invoices_created ON invoices (created_at, id);
+CREATE INDEX ix_invoices_status_created ON invoices (status, created_at);
+CREATE INDEX ix_invoices_doctor_created ON invoices (doctor_id, created_at);
+CREATE INDEX ix_invoices_patient_created ON invoices (patient_id, created_at);
+
+-- One live booking per slot. The slot_id unique key (unique_slot_booking
+-- in medisync_full.sql) moves to a generated column that is NULL for
+-- cancelled appointments, so a slot can be rebooked without deleting its
+-- cancellation history.
+--
+-- MySQL rejects ON DELETE CASCADE on the base column of a STORED
+-- generated column, so fk_slot is re-added as ON DELETE RESTRICT first:
+-- a slot with appointments on record can no longer be deleted by SQL
+-- (the ORM still deletes a slot's appointments before the slot). The
+-- plain slot_id index keeps fk_slot indexed once the unique key is gone.
+-- Run the statements in this order.
+ALTER TABLE appointments DROP FOREIGN KEY fk_slot;
+
+ALTER TABLE appointments
+    ADD INDEX ix_appointments_slot_id (slot_id),
+    DROP INDEX unique_slot_booking,
+    ADD CONSTRAINT fk_slot FOREIGN KEY (slot_id)
+        REFERENCES availability_slots (id) ON DELETE RESTRICT;
+
+ALTER TABLE appointments
+    ADD COLUMN active_slot_id INT
+        AS (CASE WHEN status = 'cancelled' THEN NULL ELSE slot_id END) STORED,
+    ADD UNIQUE INDEX uq_slot_booking (active_slot_id);